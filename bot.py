@@ -4,10 +4,17 @@ Flask-based chatbot using AIML, NLTK, and Neo4j
 """
 
 from flask import Flask, render_template, request, jsonify, redirect, url_for
+from flask.json.provider import DefaultJSONProvider
+import logging
 import os
+import re
 import time
 import numpy as np
+import orjson
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime, timezone
+from functools import lru_cache
 
 # Fix for Python 3.8+ compatibility (time.clock was removed)
 if not hasattr(time, 'clock'):
@@ -15,35 +22,78 @@ if not hasattr(time, 'clock'):
 
 import aiml
 from autocorrect import Speller
-from context_store import ChatContextStore
+from context_store import ChatContextStore, last_user_message, last_bot_message, format_history
+from ttl_cache import TTLCache
 
 # Import custom modules
 from nltk_processor import (
-    detect_intent, process_nlp, analyze_sentiment
+    detect_intent, process_nlp, process_nlp_light, analyze_sentiment
 )
 from neo4j_handler import (
-    store_chat, get_user_context, search_knowledge,
-    generate_cypher_queries, is_connected,
+    store_chat_and_emit_cypher, get_user_context, search_knowledge,
+    is_connected,
     create_user, authenticate_user, get_user_by_id,
     get_or_create_session, get_user_sessions, get_chat_history,
     get_chat_history_by_session, get_graph_stats, get_agent_info,
     get_graph_schema, query_session_memory, get_session_memory,
     get_person_from_session, find_or_create_person,
-    save_face_encoding, get_all_face_encodings, authenticate_by_face
+    save_face_encoding, get_all_face_encodings, authenticate_by_face,
+    request_session
 )
 
+logger = logging.getLogger(__name__)
+
 # Initialize spell checker
 spell = Speller(lang='en')
 
+
+@lru_cache(maxsize=20000)
+def correct_word(word):
+    """Spell-correct a single word (cached, since common words repeat across turns)"""
+    return spell(word)
+
+class ORJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson (keys sorted, like Flask's default)"""
+    
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(
+            obj, default=self.default,
+            option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+        ).decode("utf-8")
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
 # Initialize Flask app
 app = Flask(__name__)
+app.json = ORJSONProvider(app)
+
+# Worker threads for Neo4j lookups that can overlap with NLP processing
+io_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="neo4j-io")
 
 # AIML Configuration
-BRAIN_FILE = "./data/aiml_brain.dump"
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+BRAIN_FILE = os.path.join(DATA_DIR, "aiml_brain.dump")
 k = aiml.Kernel()
 
 # Chat context storage (per session)
-context_store = ChatContextStore(os.path.join("data", "chat_context.jsonl"))
+context_store = ChatContextStore(os.path.join(DATA_DIR, "chat_context.jsonl"))
+
+
+def _learn_aiml_dir(directory):
+    """Learn every .aiml file in a directory (full paths, no chdir); returns the file count"""
+    with os.scandir(directory) as entries:
+        aiml_files = sorted(e.path for e in entries if e.is_file() and e.name.endswith(".aiml"))
+    print(f"  Found {len(aiml_files)} AIML files in {os.path.basename(directory)} folder")
+    for path in aiml_files:
+        try:
+            k.learn(path)
+            print(f"  Loaded: {os.path.basename(path)}")
+        except Exception as e:
+            print(f"  Warning: Could not load {os.path.basename(path)}: {e}")
+    return len(aiml_files)
 
 
 def load_aiml_brain():
@@ -53,46 +103,27 @@ def load_aiml_brain():
         k.loadBrain(BRAIN_FILE)
     else:
         print("Parsing AIML files from data folder...")
-        original_dir = os.getcwd()
-        
-        # Load all AIML files from data folder
-        data_path = os.path.join(original_dir, "data")
-        os.chdir(data_path)
+        data_path = DATA_DIR
         
         # Load startup.xml first if exists
-        if os.path.exists("startup.xml"):
+        startup_file = os.path.join(data_path, "startup.xml")
+        if os.path.exists(startup_file):
             print("  Loading startup.xml...")
-            k.learn("startup.xml")
+            k.learn(startup_file)
         
         # Load ALL .aiml files from data folder
-        aiml_files = sorted([f for f in os.listdir(".") if f.endswith(".aiml")])
-        print(f"  Found {len(aiml_files)} AIML files in data folder")
-        for f in aiml_files:
-            try:
-                k.learn(f)
-                print(f"  Loaded: {f}")
-            except Exception as e:
-                print(f"  Warning: Could not load {f}: {e}")
-        os.chdir(original_dir)
+        loaded = _learn_aiml_dir(data_path)
         
         # Load custom AIML files from made-by-us folder
-        made_by_us_path = os.path.join(original_dir, "made-by-us")
+        made_by_us_path = os.path.join(BASE_DIR, "made-by-us")
         if os.path.exists(made_by_us_path):
             print("Loading custom AIML files from made-by-us folder...")
-            os.chdir(made_by_us_path)
-            custom_files = sorted([f for f in os.listdir(".") if f.endswith(".aiml")])
-            print(f"  Found {len(custom_files)} AIML files in made-by-us folder")
-            for f in custom_files:
-                try:
-                    k.learn(f)
-                    print(f"  Loaded: {f}")
-                except Exception as e:
-                    print(f"  Warning: Could not load {f}: {e}")
-            os.chdir(original_dir)
+            loaded += _learn_aiml_dir(made_by_us_path)
         
         print(f"Total categories loaded: {k.numCategories()}")
-        print("Saving brain file: " + BRAIN_FILE)
-        k.saveBrain(BRAIN_FILE)
+        if loaded:
+            print("Saving brain file: " + BRAIN_FILE)
+            k.saveBrain(BRAIN_FILE)
 
 
 def set_bot_properties():
@@ -111,8 +142,93 @@ def set_bot_properties():
 load_aiml_brain()
 set_bot_properties()
 
-# Store for tracking conversation state per user
-user_sessions = {}
+# Store for tracking conversation state per (user, session); idle sessions expire
+user_sessions = TTLCache(maxsize=50000, ttl=6 * 60 * 60)
+
+# Short-lived cache of user profiles; identity rarely changes between turns
+_user_cache = TTLCache(maxsize=10000, ttl=30)
+
+
+def _get_user_cached(user_id):
+    """get_user_by_id with a 30s cache (unknown users are not cached)"""
+    user = _user_cache.get(user_id)
+    if user is None:
+        user = get_user_by_id(user_id)
+        if user:
+            _user_cache.set(user_id, user)
+    return user
+
+
+def compile_phrases(phrases):
+    """Compile a list of literal phrases into one alternation regex"""
+    return re.compile("|".join(re.escape(p) for p in phrases))
+
+
+def classify_query(patterns, query_lower):
+    """Return the first category whose trigger phrases occur in the query"""
+    for category, pattern in patterns.items():
+        if pattern.search(query_lower):
+            return category
+    return None
+
+
+# Trigger phrases for questions about the logged-in user's profile
+PERSONAL_QUERY_PATTERNS = {
+    'name': compile_phrases([
+        'what is my name', 'what\'s my name', 'whats my name', 'my name', 'who am i',
+        'do you know my name', 'tell me my name', 'say my name', 'know my name'
+    ]),
+    'email': compile_phrases([
+        'what is my email', 'what\'s my email', 'whats my email', 'my email',
+        'do you know my email', 'tell me my email', 'my email address'
+    ]),
+    'username': compile_phrases([
+        'what is my username', 'what\'s my username', 'whats my username',
+        'my username', 'do you know my username', 'tell me my username'
+    ]),
+    'about_me': compile_phrases([
+        'tell me about myself', 'what do you know about me', 'who am i to you',
+        'do you know me', 'what do you know about myself'
+    ]),
+}
+
+# Trigger phrases for questions about the current session's conversation
+CONTEXT_QUERY_PATTERNS = {
+    'last_user': compile_phrases([
+        "what did i say", "what i said", "my last message",
+        "repeat what i said", "last message"
+    ]),
+    'last_bot': compile_phrases([
+        "what did you say", "what you said", "repeat that",
+        "say that again", "your last reply", "your last response"
+    ]),
+    'recap': compile_phrases([
+        "summarize", "summary", "recap", "conversation so far",
+        "what have we talked about"
+    ]),
+}
+
+# Acknowledgments for messages that share new information (compiled once at import)
+FACT_ACKNOWLEDGMENTS = [(re.compile(pattern, re.IGNORECASE), template) for pattern, template in [
+    (r"my (?:name is|name's) (\w+)", "Nice to meet you, {0}! I'll remember that. 😊"),
+    (r"my (?:fav(?:ou?rite)?|favorite) (?:color|colour) is (\w+)", "Got it! {0} is a great color! 🎨 I'll remember that."),
+    (r"my (?:fav(?:ou?rite)?|favorite) food is (.+?)(?:\.|$)", "Yum! {0} sounds delicious! 🍽️ I'll remember that."),
+    (r"my (?:fav(?:ou?rite)?|favorite) movie is (.+?)(?:\.|$)", "Nice choice! I'll remember that {0} is your favorite movie! 🎬"),
+    (r"my (?:fav(?:ou?rite)?|favorite) song is (.+?)(?:\.|$)", "Great taste in music! I'll remember {0}! 🎵"),
+    (r"my (?:fav(?:ou?rite)?|favorite) book is (.+?)(?:\.|$)", "A book lover! I'll remember {0}! 📚"),
+    (r"my (?:fav(?:ou?rite)?|favorite) game is (.+?)(?:\.|$)", "Cool! I'll remember that {0} is your favorite game! 🎮"),
+    (r"my (?:fav(?:ou?rite)?|favorite) sport is (.+?)(?:\.|$)", "Nice! I'll remember that you love {0}! ⚽"),
+    (r"my (?:fav(?:ou?rite)?|favorite) animal is (.+?)(?:\.|$)", "Awesome! I'll remember that you love {0}! 🦁"),
+    (r"i am (\d+) years old", "Got it! You're {0} years old. I'll remember that! 🎂"),
+    (r"i'm (\d+) years old", "Got it! You're {0} years old. I'll remember that! 🎂"),
+    (r"i live in (.+?)(?:\.|$)", "Cool! {0} sounds nice! I'll remember you live there. 🏠"),
+    (r"i am from (.+?)(?:\.|$)", "Nice! {0} is a great place! I'll remember that. 🌍"),
+    (r"i'm from (.+?)(?:\.|$)", "Nice! {0} is a great place! I'll remember that. 🌍"),
+    (r"i (?:like|love|enjoy) (\w+)", "Nice! I'll remember that you like {0}! ❤️"),
+    (r"i have a (.+?) named (\w+)", "Aww! {1} the {0} sounds adorable! I'll remember that! 🐾"),
+    (r"my pet(?:'s)? name is (\w+)", "Cute name! I'll remember that your pet is called {0}! 🐾"),
+    (r"my birthday is (.+?)(?:\.|$)", "I'll remember your birthday is {0}! 🎉"),
+]]
 
 
 @app.route("/")
@@ -156,6 +272,7 @@ def signup():
     success, message, user_data = create_user(username, name, email, password)
     
     if success:
+        _user_cache.set(user_data['id'], user_data)
         return jsonify({'success': True, 'message': message, 'user': user_data})
     else:
         return jsonify({'success': False, 'message': message}), 400
@@ -165,13 +282,11 @@ def signup():
 def login():
     """Handle user login"""
     data = request.get_json()
-    print(f"[LOGIN DEBUG] Received data: {data}")
     if not data:
         return jsonify({'success': False, 'message': 'No data provided'}), 400
     
     username = data.get('username', '').strip().lower()
     password = data.get('password', '')
-    print(f"[LOGIN DEBUG] Username: '{username}', Password length: {len(password)}")
     
     if not username or not password:
         return jsonify({'success': False, 'message': 'Username and password are required'}), 400
@@ -180,6 +295,7 @@ def login():
     success, message, user_data = authenticate_user(username, password)
     
     if success:
+        _user_cache.set(user_data['id'], user_data)
         return jsonify({'success': True, 'message': message, 'user': user_data})
     else:
         return jsonify({'success': False, 'message': message}), 401
@@ -188,7 +304,7 @@ def login():
 @app.route("/api/auth/user/<user_id>")
 def get_user(user_id):
     """Get user info by ID"""
-    user = get_user_by_id(user_id)
+    user = _get_user_cached(user_id)
     if user:
         return jsonify({'success': True, 'user': user})
     return jsonify({'success': False, 'message': 'User not found'}), 404
@@ -197,6 +313,18 @@ def get_user(user_id):
 # ============== FACE ID AUTHENTICATION ==============
 # Uses face descriptors generated by face-api.js in the browser
 
+# face-api.js typically uses 0.6 as threshold for same person
+FACE_MATCH_THRESHOLD = 0.6
+
+
+@lru_cache(maxsize=4096)
+def _face_descriptor(encoding_str):
+    """Stored comma-separated descriptor as a float vector (cached; only changes on re-registration)"""
+    vec = np.array(encoding_str.split(','), dtype=np.float64)
+    vec.flags.writeable = False
+    return vec
+
+
 @app.route("/api/auth/face/register", methods=['POST'])
 def register_face():
     """Register face descriptor for a user (descriptor from face-api.js)"""
@@ -226,7 +354,7 @@ def register_face():
             return jsonify({'success': False, 'message': message}), 400
             
     except Exception as e:
-        print(f"Face registration error: {e}")
+        logger.exception("Face registration error")
         return jsonify({'success': False, 'message': f'Error processing face data: {str(e)}'}), 500
 
 
@@ -245,9 +373,9 @@ def face_login():
     try:
         # Convert input descriptor to numpy array
         if isinstance(face_descriptor, list):
-            input_descriptor = np.array(face_descriptor)
+            input_descriptor = np.array(face_descriptor, dtype=np.float64)
         else:
-            input_descriptor = np.array([float(x) for x in face_descriptor.split(',')])
+            input_descriptor = np.array(face_descriptor.split(','), dtype=np.float64)
         
         # Get all stored face encodings
         stored_users = get_all_face_encodings()
@@ -255,25 +383,29 @@ def face_login():
         if not stored_users:
             return jsonify({'success': False, 'message': 'No registered faces found. Please login with password first and register your face.'}), 404
         
-        # Compare with stored encodings using Euclidean distance
-        best_match = None
-        best_distance = float('inf')
-        
+        # Stack the comparable stored encodings into one (N, D) matrix
+        candidates, descriptors = [], []
         for user in stored_users:
             try:
-                stored_descriptor = np.array([float(x) for x in user['face_encoding'].split(',')])
-                
-                # Calculate Euclidean distance
-                distance = np.linalg.norm(input_descriptor - stored_descriptor)
-                
-                # face-api.js typically uses 0.6 as threshold for same person
-                if distance < 0.6 and distance < best_distance:
-                    best_distance = distance
-                    best_match = user
-                    
-            except Exception as e:
-                print(f"Error comparing face for user {user['id']}: {e}")
+                stored_descriptor = _face_descriptor(user['face_encoding'])
+            except ValueError as e:
+                logger.warning("Error comparing face for user %s: %s", user['id'], e)
                 continue
+            if stored_descriptor.shape != input_descriptor.shape:
+                logger.warning("Error comparing face for user %s: descriptor size mismatch", user['id'])
+                continue
+            candidates.append(user)
+            descriptors.append(stored_descriptor)
+        
+        # Euclidean distance to every candidate in one vectorized pass
+        best_match = None
+        best_distance = float('inf')
+        if candidates:
+            distances = np.linalg.norm(np.stack(descriptors) - input_descriptor, axis=1)
+            best = int(np.argmin(distances))
+            if distances[best] < FACE_MATCH_THRESHOLD:
+                best_distance = float(distances[best])
+                best_match = candidates[best]
         
         if best_match:
             success, message, user_data = authenticate_by_face(best_match['id'])
@@ -289,7 +421,7 @@ def face_login():
         return jsonify({'success': False, 'message': 'Face not recognized. Please try again or login with password.'}), 401
             
     except Exception as e:
-        print(f"Face login error: {e}")
+        logger.exception("Face login error")
         return jsonify({'success': False, 'message': f'Error processing face: {str(e)}'}), 500
 
 
@@ -304,75 +436,50 @@ def check_face_available():
 
 def get_user_personal_response(query, user_id):
     """Check if query is asking about logged-in user's personal info and return appropriate response"""
-    query_lower = query.lower().strip()
+    category = classify_query(PERSONAL_QUERY_PATTERNS, query.lower().strip())
+    if not category:
+        return None
     
-    # Get user data from database
-    user_data = get_user_by_id(user_id)
+    # Get user data (cached for a few seconds across turns)
+    user_data = _get_user_cached(user_id)
     if not user_data:
         return None
     
-    # Patterns for name questions
-    name_patterns = ['what is my name', 'what\'s my name', 'whats my name', 'my name', 'who am i', 
-                     'do you know my name', 'tell me my name', 'say my name', 'know my name']
-    
-    # Patterns for email questions
-    email_patterns = ['what is my email', 'what\'s my email', 'whats my email', 'my email',
-                      'do you know my email', 'tell me my email', 'my email address']
-    
-    # Patterns for username questions
-    username_patterns = ['what is my username', 'what\'s my username', 'whats my username', 
-                         'my username', 'do you know my username', 'tell me my username']
-    
-    # Patterns for general "about me" questions
-    about_me_patterns = ['tell me about myself', 'what do you know about me', 'who am i to you',
-                         'do you know me', 'what do you know about myself']
-    
-    # Check patterns and return appropriate response
-    if any(pattern in query_lower for pattern in name_patterns):
+    if category == 'name':
         return f"Your name is {user_data['name']}! 😊"
     
-    if any(pattern in query_lower for pattern in email_patterns):
+    if category == 'email':
         return f"Your email address is {user_data['email']} 📧"
     
-    if any(pattern in query_lower for pattern in username_patterns):
+    if category == 'username':
         return f"Your username is {user_data['username']} 👤"
     
-    if any(pattern in query_lower for pattern in about_me_patterns):
-        return f"Of course I know you! You are {user_data['name']}, your username is {user_data['username']}, and your email is {user_data['email']}. How can I help you today? 😊"
-    
-    return None
+    return f"Of course I know you! You are {user_data['name']}, your username is {user_data['username']}, and your email is {user_data['email']}. How can I help you today? 😊"
 
 
 def get_contextual_response(query, user_id, session_id):
     """Answer queries that require previous chat context in the same session."""
-    query_lower = query.lower().strip()
-    history = context_store.get_history(user_id, session_id, limit=10)
+    category = classify_query(CONTEXT_QUERY_PATTERNS, query.lower().strip())
 
-    last_user = context_store.get_last_user_message(user_id, session_id)
-    last_bot = context_store.get_last_bot_message(user_id, session_id)
+    if category:
+        # Fetch the recent turns once and answer from that slice
+        history = context_store.get_history(user_id, session_id, limit=5)
 
-    # Check for "what did I say" type questions
-    if any(p in query_lower for p in [
-        "what did i say", "what i said", "my last message",
-        "repeat what i said", "last message"
-    ]):
-        if last_user:
-            return f"You said: {last_user}"
+        # Check for "what did I say" type questions
+        if category == 'last_user':
+            last_user = last_user_message(history)
+            if last_user:
+                return f"You said: {last_user}"
 
-    if any(p in query_lower for p in [
-        "what did you say", "what you said", "repeat that",
-        "say that again", "your last reply", "your last response"
-    ]):
-        if last_bot:
-            return f"I said: {last_bot}"
+        if category == 'last_bot':
+            last_bot = last_bot_message(history)
+            if last_bot:
+                return f"I said: {last_bot}"
 
-    if any(p in query_lower for p in [
-        "summarize", "summary", "recap", "conversation so far",
-        "what have we talked about"
-    ]):
-        context_text = context_store.get_context_text(user_id, session_id, limit=5)
-        if context_text:
-            return f"Here is a quick recap:\n{context_text}"
+        if category == 'recap':
+            context_text = format_history(history)
+            if context_text:
+                return f"Here is a quick recap:\n{context_text}"
 
     # Try to answer from stored facts and conversation history
     fact_response = context_store.answer_from_context(user_id, session_id, query)
@@ -384,33 +491,10 @@ def get_contextual_response(query, user_id, session_id):
 
 def get_fact_acknowledgment(query, user_id, session_id):
     """Generate acknowledgment when user shares personal information."""
-    import re
     query_lower = query.lower().strip()
     
-    # Check if this message shares new information
-    acknowledgments = {
-        r"my (?:name is|name's) (\w+)": "Nice to meet you, {0}! I'll remember that. 😊",
-        r"my (?:fav(?:ou?rite)?|favorite) (?:color|colour) is (\w+)": "Got it! {0} is a great color! 🎨 I'll remember that.",
-        r"my (?:fav(?:ou?rite)?|favorite) food is (.+?)(?:\.|$)": "Yum! {0} sounds delicious! 🍽️ I'll remember that.",
-        r"my (?:fav(?:ou?rite)?|favorite) movie is (.+?)(?:\.|$)": "Nice choice! I'll remember that {0} is your favorite movie! 🎬",
-        r"my (?:fav(?:ou?rite)?|favorite) song is (.+?)(?:\.|$)": "Great taste in music! I'll remember {0}! 🎵",
-        r"my (?:fav(?:ou?rite)?|favorite) book is (.+?)(?:\.|$)": "A book lover! I'll remember {0}! 📚",
-        r"my (?:fav(?:ou?rite)?|favorite) game is (.+?)(?:\.|$)": "Cool! I'll remember that {0} is your favorite game! 🎮",
-        r"my (?:fav(?:ou?rite)?|favorite) sport is (.+?)(?:\.|$)": "Nice! I'll remember that you love {0}! ⚽",
-        r"my (?:fav(?:ou?rite)?|favorite) animal is (.+?)(?:\.|$)": "Awesome! I'll remember that you love {0}! 🦁",
-        r"i am (\d+) years old": "Got it! You're {0} years old. I'll remember that! 🎂",
-        r"i'm (\d+) years old": "Got it! You're {0} years old. I'll remember that! 🎂",
-        r"i live in (.+?)(?:\.|$)": "Cool! {0} sounds nice! I'll remember you live there. 🏠",
-        r"i am from (.+?)(?:\.|$)": "Nice! {0} is a great place! I'll remember that. 🌍",
-        r"i'm from (.+?)(?:\.|$)": "Nice! {0} is a great place! I'll remember that. 🌍",
-        r"i (?:like|love|enjoy) (\w+)": "Nice! I'll remember that you like {0}! ❤️",
-        r"i have a (.+?) named (\w+)": "Aww! {1} the {0} sounds adorable! I'll remember that! 🐾",
-        r"my pet(?:'s)? name is (\w+)": "Cute name! I'll remember that your pet is called {0}! 🐾",
-        r"my birthday is (.+?)(?:\.|$)": "I'll remember your birthday is {0}! 🎉",
-    }
-    
-    for pattern, response_template in acknowledgments.items():
-        match = re.search(pattern, query_lower, re.IGNORECASE)
+    for pattern, response_template in FACT_ACKNOWLEDGMENTS:
+        match = pattern.search(query_lower)
         if match:
             groups = match.groups()
             return response_template.format(*[g.strip() for g in groups])
@@ -418,43 +502,53 @@ def get_fact_acknowledgment(query, user_id, session_id):
     return None
 
 
-@app.route("/get")
-def get_bot_response():
-    """Main endpoint to get bot response (returns full metadata)"""
-    query = request.args.get('msg')
-    user_id = request.args.get('user_id', 'default_user')
-    session_id = request.args.get('session_id')  # Get session_id from query params
+@dataclass
+class TurnResult:
+    """Everything a chat endpoint needs to shape its JSON reply"""
+    response: str
+    enhanced_response: str
+    cypher_queries: list
+    chat_id: str
+    session_id: str
+    nlp_data: dict
+    response_source: str
+    timestamp: str
+
+
+@request_session()
+def _handle_turn(user_id, session_id, query):
+    """Run one chat turn end to end (shared by /get and /api/chat)"""
     original_query = query
     timestamp = datetime.now(timezone.utc).isoformat()
     
-    # Initialize user session tracking if not exists
-    if user_id not in user_sessions:
-        user_sessions[user_id] = {}
+    # Start Neo4j lookups in the background
+    session_future = io_pool.submit(get_or_create_session, user_id, session_id)
+    personal_future = io_pool.submit(get_user_personal_response, original_query, user_id)
     
     # Get or create session in Neo4j
-    session_id = get_or_create_session(user_id, session_id)
-    
-    # Initialize session tracking for chat chain
-    if session_id not in user_sessions[user_id]:
-        user_sessions[user_id][session_id] = {'prev_chat_id': None}
+    session_id = session_future.result()
     
-    session_tracking = user_sessions[user_id][session_id]
-    
-    # Process NLP on original query (includes intent, entities, sentiment, WordNet nouns)
-    nlp_data = process_nlp(original_query)
-    nlp_data['intent'] = detect_intent(original_query)
+    # Session tracking for chat chain (created on first use)
+    session_tracking = user_sessions.setdefault((user_id, session_id), {'prev_chat_id': None})
     
     # Extract facts from current message BEFORE trying to respond
     # This allows "my favorite color is blue" to be stored before any response logic
     context_store._extract_facts(user_id, session_id, original_query)
     
-    # Get user context for better responses
-    context = get_user_context(user_id)
+    # Cheap pattern-based answers first; full NLP only runs when falling through to Neo4j/AIML
+    personal_response = personal_future.result()
+    contextual_response = fact_acknowledgment = None
+    if not personal_response:
+        contextual_response = get_contextual_response(original_query, user_id, session_id)
+        if not contextual_response:
+            fact_acknowledgment = get_fact_acknowledgment(original_query, user_id, session_id)
     
-    # First check if user is asking about their personal info
-    personal_response = get_user_personal_response(original_query, user_id)
-    contextual_response = get_contextual_response(original_query, user_id, session_id)
-    fact_acknowledgment = get_fact_acknowledgment(original_query, user_id, session_id)
+    if personal_response or contextual_response or fact_acknowledgment:
+        nlp_data = process_nlp_light(original_query)
+    else:
+        # Process NLP on original query (includes intent, entities, sentiment, WordNet nouns)
+        nlp_data = process_nlp(original_query)
+    nlp_data['intent'] = detect_intent(original_query, nlp_data['sentiment'])
     
     if personal_response:
         response = personal_response
@@ -470,16 +564,13 @@ def get_bot_response():
         # Try to find answer from Neo4j knowledge
         neo4j_response = search_knowledge(original_query, nlp_data['intent'], nlp_data['entities'])
         
-        # Spell correction for AIML
-        corrected_words = [spell(w) for w in original_query.split()]
-        question = " ".join(corrected_words)
-        
         # Determine bot response
         if neo4j_response:
             response = neo4j_response
             response_source = 'neo4j'
         else:
-            # Fallback to AIML
+            # Fallback to AIML (with spell correction)
+            question = " ".join(correct_word(w) for w in original_query.split())
             response = k.respond(question, session_id)
             response_source = 'aiml'
             if not response:
@@ -493,44 +584,60 @@ def get_bot_response():
             if noun_def['definition'] and response == ":)":
                 enhanced_response = f"'{noun_def['word']}' means: {noun_def['definition']}"
 
-    # Generate Cypher queries for visualization
-    cypher_queries, chat_id = generate_cypher_queries(
-        user_id, session_id, original_query, enhanced_response, timestamp, nlp_data,
-        session_tracking['prev_chat_id']
-    )
-    
-    # Store Chat in Neo4j (links Session -> Chat -> Agent)
-    chat_id = store_chat(
+    # Store Chat in Neo4j and get the Cypher queries for visualization
+    cypher_queries, chat_id = store_chat_and_emit_cypher(
         user_id, session_id, original_query, enhanced_response, timestamp, nlp_data,
         session_tracking['prev_chat_id']
     )
 
     # Store Chat in local context store
-    context_store.add_message(user_id, session_id, original_query, enhanced_response, timestamp)
+    context_store.add_message(user_id, session_id, original_query, enhanced_response, timestamp,
+                              extract_facts=False)
     
     # Update session tracking with new chat ID
     session_tracking['prev_chat_id'] = chat_id
     
+    return TurnResult(
+        response=response,
+        enhanced_response=enhanced_response,
+        cypher_queries=cypher_queries,
+        chat_id=chat_id,
+        session_id=session_id,
+        nlp_data=nlp_data,
+        response_source=response_source,
+        timestamp=timestamp
+    )
+
+
+@app.route("/get")
+def get_bot_response():
+    """Main endpoint to get bot response (returns full metadata)"""
+    query = request.args.get('msg')
+    user_id = request.args.get('user_id', 'default_user')
+    session_id = request.args.get('session_id')  # Get session_id from query params
+    
+    turn = _handle_turn(user_id, session_id, query)
+    
     # Return structured JSON output
     return jsonify({
-        'cypher_queries': cypher_queries,
-        'bot_reply': enhanced_response,
-        'session_id': session_id,
+        'cypher_queries': turn.cypher_queries,
+        'bot_reply': turn.enhanced_response,
+        'session_id': turn.session_id,
         'metadata': {
             'user_id': user_id,
-            'intent': nlp_data['intent'],
-            'sentiment': nlp_data['sentiment'],
-            'nouns': nlp_data['nouns'],
-            'response_source': response_source,
+            'intent': turn.nlp_data['intent'],
+            'sentiment': turn.nlp_data['sentiment'],
+            'nouns': turn.nlp_data['nouns'],
+            'response_source': turn.response_source,
             'neo4j_connected': is_connected(),
             'chat': {
-                'id': chat_id,
-                'input': original_query,
-                'output': enhanced_response,
-                'timestamp': timestamp
+                'id': turn.chat_id,
+                'input': query,
+                'output': turn.enhanced_response,
+                'timestamp': turn.timestamp
             }
         },
-        'nlp': nlp_data
+        'nlp': turn.nlp_data
     })
 
 
@@ -541,83 +648,13 @@ def api_chat():
     if not data or 'msg' not in data:
         return jsonify({'error': 'Missing msg field'}), 400
     
-    query = data.get('msg')
-    user_id = data.get('user_id', 'default_user')
-    original_query = query
-    timestamp = datetime.now(timezone.utc).isoformat()
-    session_id = data.get('session_id')
-    
-    # Initialize user session tracking if not exists
-    if user_id not in user_sessions:
-        user_sessions[user_id] = {}
-    
-    # Get or create session in Neo4j
-    session_id = get_or_create_session(user_id, session_id)
-    
-    # Initialize session tracking for chat chain
-    if session_id not in user_sessions[user_id]:
-        user_sessions[user_id][session_id] = {'prev_chat_id': None}
-    
-    session_tracking = user_sessions[user_id][session_id]
-    
-    # Process NLP on original query
-    nlp_data = process_nlp(original_query)
-    nlp_data['intent'] = detect_intent(original_query)
-    
-    # Extract facts from current message BEFORE trying to respond
-    context_store._extract_facts(user_id, session_id, original_query)
-    
-    # Try to find answer from Neo4j knowledge first
-    neo4j_response = search_knowledge(original_query, nlp_data['intent'], nlp_data['entities'])
-    contextual_response = get_contextual_response(original_query, user_id, session_id)
-    fact_acknowledgment = get_fact_acknowledgment(original_query, user_id, session_id)
-    
-    # Spell correction for AIML
-    corrected_words = [spell(w) for w in original_query.split()]
-    question = " ".join(corrected_words)
-    
-    # Determine bot response
-    if contextual_response:
-        response = contextual_response
-    elif fact_acknowledgment:
-        # User shared personal info, acknowledge it
-        response = fact_acknowledgment
-    elif neo4j_response:
-        response = neo4j_response
-    else:
-        response = k.respond(question, session_id)
-        if not response:
-            if nlp_data['nouns'] and len(nlp_data['nouns']) > 0:
-                if any(word in original_query.lower() for word in ['what is', 'define', 'meaning', 'explain']):
-                    noun_def = nlp_data['nouns'][0]
-                    if noun_def['definition']:
-                        response = f"'{noun_def['word']}' means: {noun_def['definition']}"
-            if not response:
-                response = ":)"
-    
-    # Generate Cypher queries for visualization
-    cypher_queries, chat_id = generate_cypher_queries(
-        user_id, session_id, original_query, response, timestamp, nlp_data,
-        session_tracking['prev_chat_id']
-    )
-    
-    # Store Chat in Neo4j
-    chat_id = store_chat(
-        user_id, session_id, original_query, response, timestamp, nlp_data,
-        session_tracking['prev_chat_id']
-    )
-
-    # Store Chat in local context store
-    context_store.add_message(user_id, session_id, original_query, response, timestamp)
-    
-    # Update session tracking
-    session_tracking['prev_chat_id'] = chat_id
+    turn = _handle_turn(data.get('user_id', 'default_user'), data.get('session_id'), data.get('msg'))
     
     # Return structured JSON output only
     return jsonify({
-        'cypher_queries': cypher_queries,
-        'bot_reply': response,
-        'session_id': session_id
+        'cypher_queries': turn.cypher_queries,
+        'bot_reply': turn.enhanced_response,
+        'session_id': turn.session_id
     })
 
 
@@ -630,22 +667,28 @@ def get_context(user_id):
 
 @app.route("/api/chat_history/<user_id>")
 def api_get_chat_history(user_id):
-    """Get full chat history for a user (across all sessions)"""
-    history = get_chat_history(user_id)
+    """Get chat history for a user (across all sessions); ?limit=&skip= page it"""
+    history = get_chat_history(user_id,
+                               limit=request.args.get('limit', type=int),
+                               skip=request.args.get('skip', 0, type=int))
     return jsonify({'user_id': user_id, 'history': history})
 
 
 @app.route("/api/chat_history/<user_id>/<session_id>")
 def api_get_session_chat_history(user_id, session_id):
-    """Get chat history for a specific session"""
-    history = get_chat_history_by_session(user_id, session_id)
+    """Get chat history for a specific session; ?limit=&skip= page it"""
+    history = get_chat_history_by_session(user_id, session_id,
+                                          limit=request.args.get('limit', type=int),
+                                          skip=request.args.get('skip', 0, type=int))
     return jsonify({'user_id': user_id, 'session_id': session_id, 'history': history})
 
 
 @app.route("/api/sessions/<user_id>")
 def api_get_user_sessions(user_id):
-    """Get all sessions for a user"""
-    sessions = get_user_sessions(user_id)
+    """Get all sessions for a user, newest first; ?limit=&skip= page it"""
+    sessions = get_user_sessions(user_id,
+                                 limit=request.args.get('limit', type=int),
+                                 skip=request.args.get('skip', 0, type=int))
     return jsonify({'user_id': user_id, 'sessions': sessions})
 
 
@@ -689,4 +732,6 @@ def get_status():
 
 
 if __name__ == "__main__":
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    # Development server only; set PENTAGON_DEBUG=1 for the debugger/reloader.
+    # For production use wsgi.py behind gunicorn (see README).
+    app.run(host='0.0.0.0', port=5000, debug=os.environ.get("PENTAGON_DEBUG") == "1", threaded=True)
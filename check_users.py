@@ -16,8 +16,7 @@ print("✓ Connected to Neo4j!")
 with driver.session() as session:
     # Check all users
     result = session.run("""
-        MATCH (p)
-        WHERE (p:Person OR p:User)
+        MATCH (p:Person|User)
         RETURN p.username as username, p.email as email, 
                p.password_hash as hash, labels(p) as labels
     """)
@@ -6,15 +6,43 @@ Also extracts and stores user facts for contextual responses.
 
 from __future__ import annotations
 
-import json
+import atexit
+import heapq
+import itertools
+import logging
+import mmap
 import os
+import queue
 import re
 import threading
-from typing import Dict, List, Optional, Tuple
+import time
+from collections import deque
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
 
+try:
+    import orjson
 
-# Patterns to extract facts from user messages
-FACT_PATTERNS = [
+    def _dumps(record: dict) -> bytes:
+        return orjson.dumps(record)
+
+    _loads = orjson.loads
+    _DecodeError = orjson.JSONDecodeError
+except ImportError:  # orjson is in requirements.txt; keep the store usable without it
+    import json
+
+    def _dumps(record: dict) -> bytes:
+        return json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    _loads = json.loads
+    _DecodeError = ValueError  # JSONDecodeError or bad UTF-8
+
+logger = logging.getLogger(__name__)
+
+
+# Patterns to extract facts from user messages.
+# Compiled once at import; patterns are lowercase and always matched against
+# lowercased text, so no IGNORECASE flag is needed.
+FACT_PATTERNS = [(re.compile(pattern), fact_type) for pattern, fact_type in [
     # "My X is Y" patterns
     (r"my (?:name is|name's) (\w+)", "name"),
     (r"i am (\w+)", "name"),  # Could be name or state
@@ -47,10 +75,10 @@ FACT_PATTERNS = [
     (r"my (\w+)'s name is (\w+)", "named_thing"),
     (r"my birthday is (.+?)(?:\.|$)", "birthday"),
     (r"i was born (?:on|in) (.+?)(?:\.|$)", "birthday"),
-]
+]]
 
-# Patterns to detect questions about stored facts
-QUESTION_PATTERNS = [
+# Patterns to detect questions about stored facts (compiled like FACT_PATTERNS)
+QUESTION_PATTERNS = [(re.compile(pattern), fact_type) for pattern, fact_type in [
     (r"what(?:'s| is) my (?:fav(?:ou?rite)?|favorite) (color|colour)", "favorite_color"),
     (r"what(?:'s| is) my (?:fav(?:ou?rite)?|favorite) food", "favorite_food"),
     (r"what(?:'s| is) my (?:fav(?:ou?rite)?|favorite) movie", "favorite_movie"),
@@ -77,45 +105,244 @@ QUESTION_PATTERNS = [
     (r"when(?:'s| is) my birthday", "birthday"),
     (r"do you remember (.+)", "memory_check"),
     (r"what did i (?:tell|say|mention) (?:you )?about (.+)", "recall_topic"),
-]
+]]
+
+
+def _any_of(patterns):
+    """Combine a compiled pattern table into one alternation, used as a single-scan prefilter."""
+    return re.compile("|".join(f"(?:{pattern.pattern})" for pattern, _ in patterns))
+
+
+# Only this many leading characters of a message are scanned for facts/questions,
+# which bounds regex work (and backtracking) on very long or hostile input
+MAX_PATTERN_INPUT_CHARS = 1000
+
+# Literal prefixes of the patterns above; a message containing none of them cannot match,
+# so a few C-level substring checks skip the regex work for most turns
+FACT_TRIGGERS = (
+    "my ", "i am ", "i'm ", "i like ", "i love ", "i enjoy ", "i hate ", "i dislike ",
+    "i don't like ", "i live in ", "i work ", "i have a ", "i was born ",
+)
+QUESTION_TRIGGERS = ("what", "where", "when", "how old", "do i ", "do you remember ")
+
+# One scan tells whether any pattern can match; the per-pattern loops only run on a hit
+# (they must stay separate: several fact patterns may match the same message)
+FACT_ANY = _any_of(FACT_PATTERNS)
+QUESTION_ANY = _any_of(QUESTION_PATTERNS)
+
+
+def _clip_pattern_input(text: str) -> Tuple[str, bool]:
+    """Leading part of `text` to scan, cut back to a sentence (or else word) boundary.
+
+    The flag is True when the cut falls mid-sentence, where a capture running
+    to the end of the clipped text may be missing its tail.
+    """
+    if len(text) <= MAX_PATTERN_INPUT_CHARS:
+        return text, False
+    head = text[:MAX_PATTERN_INPUT_CHARS]
+    cut = max(head.rfind(c) for c in ".!?\n")
+    if cut > 0:
+        return head[:cut + 1], False
+    cut = max(head.rfind(" "), head.rfind("\t"))
+    return (head[:cut] if cut > 0 else head), True
+
+
+def last_user_message(history: List[dict]) -> Optional[str]:
+    """Most recent non-empty user text in an already-fetched history slice."""
+    return next((h["user_text"] for h in reversed(history) if h.get("user_text")), None)
+
+
+def last_bot_message(history: List[dict]) -> Optional[str]:
+    """Most recent non-empty bot text in an already-fetched history slice."""
+    return next((h["bot_text"] for h in reversed(history) if h.get("bot_text")), None)
+
+
+def _format_turn(item: dict) -> str:
+    user_text = item.get("user_text", "")
+    bot_text = item.get("bot_text", "")
+    if user_text and bot_text:
+        return f"User: {user_text}\nBot: {bot_text}"
+    if user_text:
+        return f"User: {user_text}"
+    if bot_text:
+        return f"Bot: {bot_text}"
+    return ""
+
+
+def format_history(history: Iterable[dict]) -> str:
+    """Render a history slice as 'User: ...' / 'Bot: ...' lines."""
+    return "\n".join(filter(None, map(_format_turn, history)))
+
+
+# Reply templates for known fact types, used by _format_fact_response
+FACT_RESPONSE_TEMPLATES = {
+    "name": "Your name is {value}! 👤",
+    "age": "You are {value} years old! 🎂",
+    "location": "You live in {value}! 🏠",
+    "from": "You are from {value}! 🌍",
+    "workplace": "You work at {value}! 💼",
+    "job": "Your job is {value}! 💼",
+    "occupation": "You are a {value}! 👔",
+    "hobby": "Your hobby is {value}! 🎯",
+    "hobbies": "Your hobbies are {value}! 🎯",
+    "pet": "You have a {value}! 🐾",
+    "birthday": "Your birthday is {value}! 🎉",
+    "likes": "You like {value}! ❤️",
+    "dislikes": "You don't like {value}! 👎",
+    "favorite_color": "Your favorite color is {value}! 🎨",
+    "favorite_food": "Your favorite food is {value}! 🍽️",
+    "favorite_movie": "Your favorite movie is {value}! 🎬",
+    "favorite_song": "Your favorite song is {value}! 🎵",
+    "favorite_book": "Your favorite book is {value}! 📚",
+    "favorite_game": "Your favorite game is {value}! 🎮",
+    "favorite_sport": "Your favorite sport is {value}! ⚽",
+    "favorite_animal": "Your favorite animal is {value}! 🦁",
+    "favorite_number": "Your favorite number is {value}! 🔢",
+}
+
+
+# JSONL lines are written by a single background thread: it drains up to
+# WRITE_BATCH_SIZE queued lines per write and fsyncs at most every
+# FLUSH_INTERVAL_SECONDS. A full queue blocks add_message (backpressure), but
+# only after the store lock is released; each line carries a sequence number
+# taken under the lock and the writer restores that order before writing.
+WRITE_QUEUE_SIZE = 10000
+WRITE_BATCH_SIZE = 256
+FLUSH_INTERVAL_SECONDS = 0.25
+
+_STOP = object()
+
+# Number of locks fact updates are sharded over (by user_id)
+FACT_LOCK_SHARDS = 16
 
 
 class ChatContextStore:
     def __init__(self, file_path: str, max_in_memory: int = 2000) -> None:
         self.file_path = file_path
+        # Sidecar with facts extracted so far, so startup only re-extracts new log lines
+        self.facts_path = file_path + ".facts.json"
         self.max_in_memory = max_in_memory
+        # _lock guards the shared history/order/trim state and is held only briefly;
+        # fact updates take one of FACT_LOCK_SHARDS locks chosen by user_id instead
         self._lock = threading.Lock()
-        self._data: Dict[str, Dict[str, List[dict]]] = {}
+        self._fact_locks = [threading.Lock() for _ in range(FACT_LOCK_SHARDS)]
+        self._data: Dict[str, Dict[str, Deque[dict]]] = {}
+        # Global insertion order of in-memory records, so trimming evicts the oldest in O(1)
+        self._order: Deque[Tuple[str, str]] = deque()
+        self._total_count = 0
         # Store extracted facts per user+session: {user_id: {session_id: {fact_type: value}}}
         self._facts: Dict[str, Dict[str, Dict[str, str]]] = {}
+        # Inverted index over facts: {user_id: {session_id: {token: {fact_type: None}}}}
+        # Tokens come from the fact value words and the fact_type parts ("favorite_color" -> favorite, color)
+        self._fact_index: Dict[str, Dict[str, Dict[str, Dict[str, None]]]] = {}
         self._ensure_dir()
         self._load_existing()
+        self._file = self._open_log()
+        self._closed = threading.Event()
+        self._write_q: "queue.Queue[Tuple[int, object]]" = queue.Queue(maxsize=WRITE_QUEUE_SIZE)
+        self._write_seq = 0
+        self._writer = None
+        if self._file is not None:
+            self._writer = threading.Thread(target=self._writer_loop, name="context-log-writer", daemon=True)
+            self._writer.start()
+        atexit.register(self.close)
 
     def _ensure_dir(self) -> None:
         directory = os.path.dirname(self.file_path)
         if directory:
             os.makedirs(directory, exist_ok=True)
 
+    def _open_log(self):
+        """Open the JSONL log once for appending; writes are buffered in memory."""
+        try:
+            return open(self.file_path, "ab", buffering=1 << 16)
+        except OSError:
+            return None
+
     def _load_existing(self) -> None:
-        if not os.path.exists(self.file_path):
+        if not os.path.exists(self.file_path) or os.path.getsize(self.file_path) == 0:
+            return
+        # Facts saved by the previous run cover the log up to this byte offset
+        facts_covered = self._load_facts_sidecar()
+        try:
+            with open(self.file_path, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                if not size:
+                    return
+                mm = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+                if hasattr(mmap, "MADV_SEQUENTIAL"):
+                    # One front-to-back pass: let the kernel read ahead aggressively
+                    mm.madvise(mmap.MADV_SEQUENTIAL)
+                try:
+                    while True:
+                        offset = mm.tell()
+                        line = mm.readline()
+                        if not line:
+                            break
+                        line = line.strip()
+                        if not line:
+                            continue
+                        try:
+                            record = _loads(line)
+                            self._append_to_memory(record)
+                            if offset < facts_covered:
+                                continue
+                            # Extract facts from historical messages not covered by the sidecar
+                            user_id = record.get("user_id")
+                            session_id = record.get("session_id")
+                            user_text = record.get("user_text")
+                            if user_id and session_id and user_text:
+                                self._extract_facts(user_id, session_id, user_text)
+                        except _DecodeError:
+                            continue
+                finally:
+                    mm.close()
+        except (OSError, ValueError):
+            pass
+
+    def _load_facts_sidecar(self) -> int:
+        """Load facts saved at the last shutdown; returns how many log bytes they cover (0 if none)."""
+        try:
+            with open(self.facts_path, "rb") as f:
+                saved = _loads(f.read())
+            covered = int(saved["jsonl_size"])
+            facts = saved["facts"]
+        except (OSError, ValueError, KeyError, TypeError):
+            return 0
+        if covered > os.path.getsize(self.file_path):
+            # The log was truncated or replaced; re-extract everything
+            return 0
+        for user_id, sessions in facts.items():
+            for session_id, items in sessions.items():
+                for fact_type, value in items.items():
+                    self._store_fact(user_id, session_id, fact_type, value)
+        return covered
+
+    def _snapshot_facts(self) -> Dict[str, Dict[str, Dict[str, str]]]:
+        """Copy all facts while holding every shard lock (taken in index order)."""
+        for lock in self._fact_locks:
+            lock.acquire()
+        try:
+            return {
+                user_id: {session_id: dict(items) for session_id, items in sessions.items()}
+                for user_id, sessions in self._facts.items()
+            }
+        finally:
+            for lock in reversed(self._fact_locks):
+                lock.release()
+
+    def _save_facts_sidecar(self) -> None:
+        """Atomically write the extracted facts next to the log, with the log size they cover."""
+        try:
+            size = os.path.getsize(self.file_path)
+        except OSError:
             return
+        facts = self._snapshot_facts()
+        tmp_path = self.facts_path + ".tmp"
         try:
-            with open(self.file_path, "r", encoding="utf-8") as f:
-                for line in f:
-                    line = line.strip()
-                    if not line:
-                        continue
-                    try:
-                        record = json.loads(line)
-                        self._append_to_memory(record)
-                        # Extract facts from historical messages
-                        user_id = record.get("user_id")
-                        session_id = record.get("session_id")
-                        user_text = record.get("user_text")
-                        if user_id and session_id and user_text:
-                            self._extract_facts(user_id, session_id, user_text)
-                    except json.JSONDecodeError:
-                        continue
+            with open(tmp_path, "wb") as f:
+                f.write(_dumps({"jsonl_size": size, "facts": facts}))
+            os.replace(tmp_path, self.facts_path)
         except OSError:
             pass
 
@@ -124,27 +351,25 @@ class ChatContextStore:
         session_id = record.get("session_id")
         if not user_id or not session_id:
             return
-        self._data.setdefault(user_id, {}).setdefault(session_id, []).append(record)
+        self._data.setdefault(user_id, {}).setdefault(session_id, deque()).append(record)
+        self._order.append((user_id, session_id))
+        self._total_count += 1
 
         # Trim oldest entries if needed
-        total = sum(len(s) for u in self._data.values() for s in u.values())
-        if total > self.max_in_memory:
-            self._trim_oldest(total - self.max_in_memory)
+        if self._total_count > self.max_in_memory:
+            self._trim_oldest(self._total_count - self.max_in_memory)
 
     def _trim_oldest(self, count: int) -> None:
-        removed = 0
-        for user_id in list(self._data.keys()):
-            for session_id in list(self._data[user_id].keys()):
-                session_list = self._data[user_id][session_id]
-                while session_list and removed < count:
-                    session_list.pop(0)
-                    removed += 1
-                if not session_list:
-                    del self._data[user_id][session_id]
-            if not self._data[user_id]:
-                del self._data[user_id]
-            if removed >= count:
-                return
+        for _ in range(min(count, self._total_count)):
+            user_id, session_id = self._order.popleft()
+            sessions = self._data[user_id]
+            session_list = sessions[session_id]
+            session_list.popleft()
+            self._total_count -= 1
+            if not session_list:
+                del sessions[session_id]
+                if not sessions:
+                    del self._data[user_id]
 
     def add_message(
         self,
@@ -153,7 +378,9 @@ class ChatContextStore:
         user_text: str,
         bot_text: str,
         timestamp: str,
+        extract_facts: bool = True,
     ) -> None:
+        """Record a turn; pass extract_facts=False if the caller already ran _extract_facts."""
         record = {
             "user_id": user_id,
             "session_id": session_id,
@@ -161,54 +388,157 @@ class ChatContextStore:
             "bot_text": bot_text,
             "timestamp": timestamp,
         }
+        line = _dumps(record) + b"\n"
+        seq = None
         with self._lock:
             self._append_to_memory(record)
-            # Extract facts from user message
-            if user_text:
-                self._extract_facts(user_id, session_id, user_text)
+            # Numbered under the lock so the file keeps the same order as memory
+            if self._writer is not None and not self._closed.is_set():
+                seq = self._write_seq
+                self._write_seq += 1
+        if seq is not None:
+            # May block on a full queue; readers of the store are not held up
+            self._write_q.put((seq, line))
+        elif self._closed.is_set():
+            logger.warning("Chat context store is closed; turn for %s/%s kept in memory only",
+                           user_id, session_id)
+        # Extract facts from user message (outside the store lock; facts use per-user locks)
+        if extract_facts and user_text:
+            self._extract_facts(user_id, session_id, user_text)
+
+    def _writer_loop(self) -> None:
+        """Drain queued lines in batches, in sequence order; the only thread that writes the log file."""
+        last_sync = time.monotonic()
+        dirty = False
+        # Lines that arrived ahead of a sequence number still being queued
+        pending: List[Tuple[int, bytes]] = []
+        next_seq = 0
+        stop_at = None
+        while True:
+            batch = []
+            try:
+                batch.append(self._write_q.get(timeout=FLUSH_INTERVAL_SECONDS))
+                while len(batch) < WRITE_BATCH_SIZE:
+                    batch.append(self._write_q.get_nowait())
+            except queue.Empty:
+                pass
+            for seq, item in batch:
+                if item is _STOP:
+                    stop_at = seq
+                    self._write_q.task_done()
+                else:
+                    heapq.heappush(pending, (seq, item))
+            lines = []
+            while pending and pending[0][0] == next_seq:
+                lines.append(heapq.heappop(pending)[1])
+                next_seq += 1
+            if lines:
+                try:
+                    self._file.writelines(lines)
+                    self._file.flush()
+                    dirty = True
+                except (OSError, ValueError):
+                    pass
+            # _STOP carries the next unused sequence number: stop once all before it are written
+            stop = stop_at is not None and next_seq >= stop_at
+            now = time.monotonic()
+            if dirty and (stop or not lines or now - last_sync >= FLUSH_INTERVAL_SECONDS):
+                self._fsync()
+                dirty = False
+                last_sync = now
+            # Marked done only once written, so flush() also waits out sequence gaps
+            for _ in lines:
+                self._write_q.task_done()
+            if stop:
+                return
+
+    def _fsync(self) -> None:
+        f = self._file
+        if f is None:
+            return
+        try:
+            os.fsync(f.fileno())
+        except (OSError, ValueError):
+            pass
+
+    def flush(self) -> None:
+        """Block until every queued record has been written and synced to disk."""
+        if self._writer is None or not self._writer.is_alive():
+            return
+        self._write_q.join()
+        self._fsync()
+
+    def close(self) -> None:
+        """Write out queued records, stop the writer thread, close the JSONL log and save facts."""
+        if self._closed.is_set():
+            return
+        with self._lock:
+            self._closed.set()
+            final_seq = self._write_seq
+        if self._writer is not None and self._writer.is_alive():
+            self._write_q.put((final_seq, _STOP))
+            self._writer.join(timeout=5)
+            if self._writer.is_alive():
+                # Still writing: leave the file open, and skip the sidecar so its
+                # jsonl_size cannot miss lines whose facts it already holds
+                logger.warning("Chat context writer did not finish within 5s; facts sidecar not saved")
+                return
+        if self._file is not None:
             try:
-                with open(self.file_path, "a", encoding="utf-8") as f:
-                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                self._file.close()
             except OSError:
                 pass
+            self._file = None
+            self._save_facts_sidecar()
+
+    def get_history(
+        self, user_id: str, session_id: str, limit: int = 10, newest_first: bool = False
+    ) -> List[dict]:
+        """A copy of the last `limit` records, taken under _lock (trimming can pop the live deque)."""
+        if limit <= 0:
+            return []
+        with self._lock:
+            history = self._data.get(user_id, {}).get(session_id)
+            if not history:
+                return []
+            # Walk back from the tail so the cost is O(limit), not O(session length)
+            tail = list(itertools.islice(reversed(history), limit))
+        if not newest_first:
+            tail.reverse()
+        return tail
 
-    def get_history(self, user_id: str, session_id: str, limit: int = 10) -> List[dict]:
-        sessions = self._data.get(user_id, {})
-        history = sessions.get(session_id, [])
-        return history[-limit:]
+    def _last_record(self, user_id: str, session_id: str) -> Optional[dict]:
+        with self._lock:
+            sessions = self._data.get(user_id)
+            history = sessions.get(session_id) if sessions else None
+            return history[-1] if history else None
 
     def get_last_user_message(self, user_id: str, session_id: str) -> Optional[str]:
-        history = self.get_history(user_id, session_id, limit=1)
-        if not history:
-            return None
-        return history[-1].get("user_text")
+        record = self._last_record(user_id, session_id)
+        return record.get("user_text") if record else None
 
     def get_last_bot_message(self, user_id: str, session_id: str) -> Optional[str]:
-        history = self.get_history(user_id, session_id, limit=1)
-        if not history:
-            return None
-        return history[-1].get("bot_text")
+        record = self._last_record(user_id, session_id)
+        return record.get("bot_text") if record else None
 
     def get_context_text(self, user_id: str, session_id: str, limit: int = 5) -> str:
-        history = self.get_history(user_id, session_id, limit=limit)
-        if not history:
-            return ""
-        lines = []
-        for item in history:
-            user_text = item.get("user_text", "")
-            bot_text = item.get("bot_text", "")
-            if user_text:
-                lines.append(f"User: {user_text}")
-            if bot_text:
-                lines.append(f"Bot: {bot_text}")
-        return "\n".join(lines)
+        if limit == 1:
+            record = self._last_record(user_id, session_id)
+            return format_history([record]) if record else ""
+        return format_history(self.get_history(user_id, session_id, limit=limit))
 
     def _extract_facts(self, user_id: str, session_id: str, text: str) -> None:
         """Extract facts from user message and store them."""
-        text_lower = text.lower().strip()
+        clipped, mid_sentence = _clip_pattern_input(text)
+        text_lower = clipped.lower().strip()
+        if not any(t in text_lower for t in FACT_TRIGGERS) or not FACT_ANY.search(text_lower):
+            return
         
         for pattern, fact_type in FACT_PATTERNS:
-            match = re.search(pattern, text_lower, re.IGNORECASE)
+            match = pattern.search(text_lower)
+            if match and mid_sentence and match.end() == len(text_lower):
+                # The value may continue past the clip point; a cut-off fact is worse than none
+                continue
             if match:
                 if fact_type == "favorite_generic":
                     # Handle "my favorite X is Y"
@@ -236,112 +566,122 @@ class ChatContextStore:
         """Store a fact for a user session."""
         if not value:
             return
-        self._facts.setdefault(user_id, {}).setdefault(session_id, {})[fact_type] = value
+        # Values are captured from lowercased text, so they are already lowercase
+        tokens = set(value.split()) | set(fact_type.split("_"))
+        with self._fact_lock(user_id):
+            facts = self._facts.setdefault(user_id, {}).setdefault(session_id, {})
+            previous = facts.get(fact_type)
+            facts[fact_type] = value
+
+            index = self._fact_index.setdefault(user_id, {}).setdefault(session_id, {})
+            if previous:
+                # Drop tokens that only the overwritten value contributed
+                for token in set(previous.split()) - tokens:
+                    keys = index.get(token)
+                    if keys is not None:
+                        keys.pop(fact_type, None)
+                        if not keys:
+                            del index[token]
+            for token in tokens:
+                index.setdefault(token, {})[fact_type] = None
+
+    def _fact_lock(self, user_id: str) -> threading.Lock:
+        return self._fact_locks[hash(user_id) % FACT_LOCK_SHARDS]
 
     def get_fact(self, user_id: str, session_id: str, fact_type: str) -> Optional[str]:
         """Get a stored fact."""
-        return self._facts.get(user_id, {}).get(session_id, {}).get(fact_type)
+        with self._fact_lock(user_id):
+            return self._facts.get(user_id, {}).get(session_id, {}).get(fact_type)
 
     def get_all_facts(self, user_id: str, session_id: str) -> Dict[str, str]:
         """Get all stored facts for a user session."""
-        return self._facts.get(user_id, {}).get(session_id, {}).copy()
+        with self._fact_lock(user_id):
+            return self._facts.get(user_id, {}).get(session_id, {}).copy()
 
     def answer_from_context(self, user_id: str, session_id: str, query: str) -> Optional[str]:
         """Try to answer a question using stored facts and conversation history."""
-        query_lower = query.lower().strip()
+        query_lower = _clip_pattern_input(query)[0].lower().strip()
         facts = self.get_all_facts(user_id, session_id)
         
         # Check question patterns
-        for pattern, fact_type in QUESTION_PATTERNS:
-            match = re.search(pattern, query_lower, re.IGNORECASE)
-            if match:
-                if fact_type == "favorite_generic":
-                    # "what is my favorite X"
-                    thing = match.group(1)
-                    fact_key = f"favorite_{thing}"
-                    value = facts.get(fact_key)
-                    if value:
-                        return f"Your favorite {thing} is {value}! 😊"
-                elif fact_type == "favorite_color":
-                    value = facts.get("favorite_color") or facts.get("favorite_colour")
-                    if value:
-                        return f"Your favorite color is {value}! 🎨"
-                elif fact_type == "memory_check":
-                    # "do you remember X"
-                    topic = match.group(1).strip()
-                    return self._search_memory(user_id, session_id, topic, facts)
-                elif fact_type == "recall_topic":
-                    # "what did I tell you about X"
-                    topic = match.group(1).strip()
-                    return self._search_memory(user_id, session_id, topic, facts)
-                else:
-                    value = facts.get(fact_type)
-                    if value:
-                        return self._format_fact_response(fact_type, value)
+        if any(t in query_lower for t in QUESTION_TRIGGERS) and QUESTION_ANY.search(query_lower):
+            for pattern, fact_type in QUESTION_PATTERNS:
+                match = pattern.search(query_lower)
+                if match:
+                    if fact_type == "favorite_generic":
+                        # "what is my favorite X"
+                        thing = match.group(1)
+                        fact_key = f"favorite_{thing}"
+                        value = facts.get(fact_key)
+                        if value:
+                            return f"Your favorite {thing} is {value}! 😊"
+                    elif fact_type == "favorite_color":
+                        value = facts.get("favorite_color") or facts.get("favorite_colour")
+                        if value:
+                            return f"Your favorite color is {value}! 🎨"
+                    elif fact_type == "memory_check":
+                        # "do you remember X"
+                        topic = match.group(1).strip()
+                        return self._search_memory(user_id, session_id, topic, facts)
+                    elif fact_type == "recall_topic":
+                        # "what did I tell you about X"
+                        topic = match.group(1).strip()
+                        return self._search_memory(user_id, session_id, topic, facts)
+                    else:
+                        value = facts.get(fact_type)
+                        if value:
+                            return self._format_fact_response(fact_type, value)
         
-        # Generic search in facts for keywords
-        for word in query_lower.split():
-            if len(word) > 3:  # Skip short words
-                for fact_key, fact_value in facts.items():
-                    if word in fact_key or word in fact_value.lower():
-                        return self._format_fact_response(fact_key, fact_value)
+        # Generic search in facts for keywords (inverted index lookup per word);
+        # key and value are read together under the shard lock _store_fact holds
+        match = None
+        with self._fact_lock(user_id):
+            index = self._fact_index.get(user_id, {}).get(session_id)
+            if index:
+                session_facts = self._facts.get(user_id, {}).get(session_id, {})
+                for word in query_lower.split():
+                    if len(word) > 3:  # Skip short words
+                        keys = index.get(word)
+                        if keys:
+                            fact_key = next(iter(keys))
+                            match = (fact_key, session_facts.get(fact_key))
+                            break
+        if match and match[1]:
+            return self._format_fact_response(*match)
         
         return None
 
     def _search_memory(self, user_id: str, session_id: str, topic: str, facts: Dict[str, str]) -> Optional[str]:
-        """Search conversation history and facts for a topic."""
-        topic_lower = topic.lower()
-        
+        """Search conversation history and facts for a (lowercase) topic."""
         # First check facts
         for fact_key, fact_value in facts.items():
-            if topic_lower in fact_key or topic_lower in fact_value.lower():
+            if topic in fact_key or topic in fact_value:
                 return f"Yes, I remember! {self._format_fact_response(fact_key, fact_value)}"
         
         # Then search conversation history
-        history = self.get_history(user_id, session_id, limit=20)
-        for item in reversed(history):
+        for item in self.get_history(user_id, session_id, limit=20, newest_first=True):
             user_text = item.get("user_text", "").lower()
-            if topic_lower in user_text:
+            if topic in user_text:
                 return f"Yes, you mentioned: \"{item.get('user_text')}\""
         
         return f"I don't recall you telling me about {topic}. Could you remind me?"
 
     def _format_fact_response(self, fact_type: str, value: str) -> str:
         """Format a response based on fact type."""
-        responses = {
-            "name": f"Your name is {value}! 👤",
-            "age": f"You are {value} years old! 🎂",
-            "location": f"You live in {value}! 🏠",
-            "from": f"You are from {value}! 🌍",
-            "workplace": f"You work at {value}! 💼",
-            "job": f"Your job is {value}! 💼",
-            "occupation": f"You are a {value}! 👔",
-            "hobby": f"Your hobby is {value}! 🎯",
-            "hobbies": f"Your hobbies are {value}! 🎯",
-            "pet": f"You have a {value}! 🐾",
-            "pet_name": f"Your pet's name is {value}! 🐾",
-            "birthday": f"Your birthday is {value}! 🎉",
-            "likes": f"You like {value}! ❤️",
-            "dislikes": f"You don't like {value}! 👎",
-            "favorite_color": f"Your favorite color is {value}! 🎨",
-            "favorite_food": f"Your favorite food is {value}! 🍽️",
-            "favorite_movie": f"Your favorite movie is {value}! 🎬",
-            "favorite_song": f"Your favorite song is {value}! 🎵",
-            "favorite_book": f"Your favorite book is {value}! 📚",
-            "favorite_game": f"Your favorite game is {value}! 🎮",
-            "favorite_sport": f"Your favorite sport is {value}! ⚽",
-            "favorite_animal": f"Your favorite animal is {value}! 🦁",
-            "favorite_number": f"Your favorite number is {value}! 🔢",
-        }
-        
         # Handle favorite_X patterns
         if fact_type.startswith("favorite_"):
+            template = FACT_RESPONSE_TEMPLATES.get(fact_type)
+            if template:
+                return template.format(value=value)
             thing = fact_type.replace("favorite_", "")
-            return responses.get(fact_type, f"Your favorite {thing} is {value}! ✨")
+            return f"Your favorite {thing} is {value}! ✨"
         
         # Handle X_name patterns (like dog_name, cat_name)
         if fact_type.endswith("_name"):
             thing = fact_type.replace("_name", "")
             return f"Your {thing}'s name is {value}! 😊"
         
-        return responses.get(fact_type, f"You told me that your {fact_type.replace('_', ' ')} is {value}! 😊")
+        template = FACT_RESPONSE_TEMPLATES.get(fact_type)
+        if template:
+            return template.format(value=value)
+        return f"You told me that your {fact_type.replace('_', ' ')} is {value}! 😊"
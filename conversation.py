@@ -1,5 +1,7 @@
+import glob
 import os
 import time
+from functools import lru_cache
 
 # Fix for Python 3.8+ compatibility (time.clock was removed)
 if not hasattr(time, 'clock'):
@@ -10,7 +12,16 @@ from autocorrect import Speller
 
 spell = Speller(lang='en')
 
-BRAIN_FILE="./data/aiml_brain.dump"
+
+@lru_cache(maxsize=4096)
+def spell_word(word):
+    """Spell-correct a single word (cached, since chat vocabulary repeats)"""
+    return spell(word)
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+BRAIN_FILE = os.path.join(DATA_DIR, "aiml_brain.dump")
 
 k = aiml.Kernel()
 
@@ -19,26 +30,23 @@ if os.path.exists(BRAIN_FILE):
     k.loadBrain(BRAIN_FILE)
 else:
     print("Parsing aiml files from data folder...")
-    # Change to data directory and load all AIML files
-    original_dir = os.getcwd()
-    os.chdir(os.path.join(original_dir, "data"))
-    k.learn("std-startup.xml") if os.path.exists("std-startup.xml") else None
+    # Learn by absolute path; no chdir needed
+    startup_file = os.path.join(DATA_DIR, "std-startup.xml")
+    if os.path.exists(startup_file):
+        k.learn(startup_file)
     # Load all .aiml files
-    for f in os.listdir("."):
-        if f.endswith(".aiml"):
-            try:
-                k.learn(f)
-            except Exception as e:
-                print(f"Warning: Could not load {f}: {e}")
-    os.chdir(original_dir)
+    for path in sorted(glob.iglob(os.path.join(DATA_DIR, "*.aiml"))):
+        try:
+            k.learn(path)
+        except Exception as e:
+            print(f"Warning: Could not load {os.path.basename(path)}: {e}")
     print("Saving brain file: " + BRAIN_FILE)
     k.saveBrain(BRAIN_FILE)
 
 
 while True:
     query = input("User > ")
-    query = [spell(w) for w in (query.split())]
-    question = " ".join(query)
+    question = " ".join(spell_word(w) for w in query.split())
     response = k.respond(question)
     if response:
         print("bot > ", response)
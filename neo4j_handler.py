@@ -19,120 +19,424 @@ Session stores arrays (short-term memory):
   - timestamps[]: Time of each message
 """
 
-from neo4j import GraphDatabase
+from neo4j import GraphDatabase, READ_ACCESS, WRITE_ACCESS, RoutingControl
+from neo4j.exceptions import ConstraintError
+import atexit
+import contextvars
 import hashlib
+import hmac
+import textwrap
+import threading
+import time
 import uuid
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
 from datetime import datetime, timezone
-import json
+import logging
+import os
+import re
+
+import orjson
+
+from ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+# Cached lookups keep frozen records so no caller can corrupt a cached entry;
+# the public functions still return plain dicts built from them
+@dataclass(frozen=True)
+class Person:
+    """A session owner as cached by get_person_from_session"""
+    id: str
+    username: str
+    name: str
+    email: str
+
+
+@dataclass(frozen=True)
+class AgentInfo:
+    """The Agent (Pentagon) node as cached by get_agent_info"""
+    name: str
+    creator: str
+    members: tuple
+    city: str
+    company: str
+
+    def as_dict(self):
+        """The dict get_agent_info returns (members as a list, as stored)"""
+        info = asdict(self)
+        info['members'] = list(self.members)
+        return info
+
 
 # Neo4j Connection Configuration
 NEO4J_URI = "bolt://127.0.0.1:7687"
 NEO4J_USER = "neo4j"
 NEO4J_PASSWORD = "Pakistan@2"
-
-# Global driver instance
+# Naming the database lets the driver skip the home-database lookup
+NEO4J_DATABASE = "neo4j"
+
+# Connection pool tuned for many small concurrent reads
+NEO4J_DRIVER_CONFIG = {
+    # Size to the server's worker threads; each busy thread holds one connection
+    'max_connection_pool_size': int(os.environ.get('NEO4J_POOL', 100)),
+    'connection_acquisition_timeout': 30,  # seconds to wait for a free connection
+    'connection_timeout': 15,
+    'max_connection_lifetime': 3600,
+    'keep_alive': True,
+    'fetch_size': 1000,
+}
+
+# Global driver instance (one per process, shared by all request threads)
 driver = None
+_driver_lock = threading.Lock()
+
+# verify_connectivity() is a network round trip; reuse its result briefly
+CONNECTIVITY_CHECK_TTL = 5.0
+_connectivity = {'checked_at': 0.0, 'ok': False}
+
+# After a failed connect, handlers get None at once instead of each paying
+# a fresh connection attempt until this many seconds have passed
+RECONNECT_BACKOFF = 10.0
+_last_connect_failure = float('-inf')
+
+
+# Graph setup (constraints, migration, Agent/admin nodes) runs once, lazily;
+# a failed run is retried after RECONNECT_BACKOFF, not on every call
+_init_lock = threading.Lock()
+_init_state = {'done': False, 'owner': None}
+_last_init_failure = float('-inf')
+
+
+def ensure_initialized():
+    """Run init_graph_structure until it succeeds once; other threads wait for it"""
+    global _last_init_failure
+    if _init_state['done'] or _init_state['owner'] == threading.get_ident():
+        # Done, or re-entered from init_graph_structure's own get_driver() calls
+        return
+    if time.monotonic() - _last_init_failure < RECONNECT_BACKOFF:
+        return
+    with _init_lock:
+        if _init_state['done'] or time.monotonic() - _last_init_failure < RECONNECT_BACKOFF:
+            return
+        _init_state['owner'] = threading.get_ident()
+        ok = False
+        try:
+            ok = init_graph_structure()
+        finally:
+            _init_state['owner'] = None
+            if ok:
+                _init_state['done'] = True
+            else:
+                _last_init_failure = time.monotonic()
 
 
 def get_driver():
-    """Get or create Neo4j driver instance"""
-    global driver
-    if driver is None:
-        try:
-            driver = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD))
-            driver.verify_connectivity()
-            print("Neo4j connection established successfully!")
-        except Exception as e:
-            print(f"Failed to connect to Neo4j: {e}")
-            return None
+    """Get or create Neo4j driver instance (initialising the graph on first use)"""
+    if driver is not None:
+        if not _init_state['done']:
+            ensure_initialized()
+        return driver
+    d = _connect()
+    if d is not None:
+        ensure_initialized()
+    return d
+
+
+def _connect():
+    """Create the process-wide driver, unless a recent attempt failed"""
+    global driver, _last_connect_failure
+    if driver is not None:
+        return driver
+    if time.monotonic() - _last_connect_failure < RECONNECT_BACKOFF:
+        return None
+    with _driver_lock:
+        if driver is None and time.monotonic() - _last_connect_failure >= RECONNECT_BACKOFF:
+            try:
+                d = GraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USER, NEO4J_PASSWORD),
+                                         **NEO4J_DRIVER_CONFIG)
+                try:
+                    d.verify_connectivity()
+                except Exception:
+                    d.close()
+                    raise
+                driver = d
+                atexit.register(d.close)
+                print("Neo4j connection established successfully!")
+            except Exception as e:
+                _last_connect_failure = time.monotonic()
+                logger.error("Failed to connect to Neo4j: %s", e)
     return driver
 
 
 def is_connected():
     """Check if Neo4j is connected"""
+    now = time.monotonic()
+    if now - _connectivity['checked_at'] < CONNECTIVITY_CHECK_TTL:
+        return _connectivity['ok']
+    ok = False
     try:
         d = get_driver()
         if d:
             d.verify_connectivity()
-            return True
-    except:
+            ok = True
+    except Exception:
         pass
-    return False
+    _connectivity['checked_at'] = now
+    _connectivity['ok'] = ok
+    return ok
+
+
+# Session shared by every handler call inside a request_session() block
+_request_session = contextvars.ContextVar('neo4j_request_session', default=None)
+
+
+@contextmanager
+def request_session():
+    """
+    Share one Neo4j session across all handler calls made inside this block
+    (per thread / context). Usable as a decorator on request handlers.
+    """
+    d = get_driver() if _request_session.get() is None else None
+    if d is None:
+        yield _request_session.get()
+        return
+    with d.session(database=NEO4J_DATABASE) as session:
+        token = _request_session.set(session)
+        try:
+            yield session
+        finally:
+            _request_session.reset(token)
+
+
+@contextmanager
+def _session(d, access_mode=WRITE_ACCESS):
+    """The request's shared session if there is one, else a new session"""
+    shared = _request_session.get()
+    if shared is not None:
+        yield shared
+        return
+    with d.session(database=NEO4J_DATABASE, default_access_mode=access_mode) as session:
+        yield session
+
+
+def _read(session, query, **params):
+    """Run a query in a read transaction (routed to readers, retried on transient errors)"""
+    return session.execute_read(lambda tx: list(tx.run(query, **params)))
+
+
+def _read_single(session, query, **params):
+    """Like _read, for queries expected to return at most one record"""
+    return session.execute_read(lambda tx: tx.run(query, **params).single())
+
+
+def _query_single(d, query, **params):
+    """
+    One-shot read through driver.execute_query (no session object); first
+    record or None. Inside request_session() the shared session is used
+    instead, so a turn never holds a second pooled connection.
+    """
+    shared = _request_session.get()
+    if shared is not None:
+        records = _read(shared, query, **params)
+    else:
+        records, _, _ = d.execute_query(query, params, routing_=RoutingControl.READ,
+                                        database_=NEO4J_DATABASE)
+    return records[0] if records else None
 
 
 def hash_password(password):
-    """Hash password using SHA-256"""
-    return hashlib.sha256(password.encode()).hexdigest()
+    """Hash password (str or UTF-8 bytes) using SHA-256"""
+    if isinstance(password, str):
+        password = password.encode()
+    return hashlib.sha256(password).hexdigest()
 
 
 # ============== GRAPH INITIALIZATION ==============
 
+# Uniqueness constraints backing the property lookups used throughout this
+# module (login, profile lookups, session MATCH/MERGE, agent MERGE). Each
+# constraint brings its own index, so lookups seek instead of scanning, and
+# duplicate usernames/emails are rejected by the database itself.
+# (name, label, property)
+SCHEMA_CONSTRAINTS = [
+    ("person_id", "Person", "id"),
+    ("person_username", "Person", "username"),
+    ("person_email", "Person", "email"),
+    ("session_id", "Session", "id"),
+    ("agent_name", "Agent", "name"),
+]
+
+
+# Set by ensure_indexes: True only once every SCHEMA_CONSTRAINTS entry exists,
+# i.e. the database itself rejects duplicate usernames/emails
+_schema_state = {'constraints': False}
+
+
+def _ensure_plain_index(session, name, label, prop):
+    """Keep (or create) the plain index `name` so lookups still seek"""
+    try:
+        session.run(f"CREATE INDEX {name} IF NOT EXISTS FOR (n:{label}) ON (n.{prop})").consume()
+    except Exception as e:
+        print(f"Index {name} not created (non-fatal): {e}")
+
+
+def _create_constraint(session, name, label, prop):
+    """Replace the plain index `name` by the `{name}_unique` constraint, if the data allows it"""
+    try:
+        duplicates = session.run(f"""
+            MATCH (n:{label}) WHERE n.{prop} IS NOT NULL
+            WITH n.{prop} AS value, count(*) AS copies WHERE copies > 1
+            RETURN count(value) AS duplicates
+        """).single()['duplicates']
+    except Exception as e:
+        print(f"Constraint {name}_unique not checked (non-fatal): {e}")
+        _ensure_plain_index(session, name, label, prop)
+        return False
+    if duplicates:
+        # The constraint cannot be created; leave the existing index alone
+        print(f"Constraint {name}_unique not created (non-fatal): "
+              f"{duplicates} duplicated {label}.{prop} values")
+        _ensure_plain_index(session, name, label, prop)
+        return False
+    
+    # A plain index from older versions would block the constraint
+    try:
+        session.run(f"DROP INDEX {name} IF EXISTS").consume()
+    except Exception as e:
+        print(f"Index {name} not dropped (non-fatal): {e}")
+        return False
+    try:
+        session.run(f"CREATE CONSTRAINT {name}_unique IF NOT EXISTS "
+                    f"FOR (n:{label}) REQUIRE n.{prop} IS UNIQUE").consume()
+        return True
+    except Exception as e:
+        print(f"Constraint {name}_unique not created (non-fatal): {e}")
+        _ensure_plain_index(session, name, label, prop)
+        return False
+
+
+def ensure_indexes():
+    """Create the schema constraints (or plain indexes) if they do not exist yet"""
+    d = get_driver()
+    if not d:
+        return False
+    
+    unique = 0
+    with d.session(database=NEO4J_DATABASE) as session:
+        try:
+            existing = set(session.run(
+                "SHOW CONSTRAINTS YIELD name RETURN collect(name) AS names"
+            ).single()['names'])
+        except Exception as e:
+            print(f"Could not list constraints (non-fatal): {e}")
+            existing = set()
+        for name, label, prop in SCHEMA_CONSTRAINTS:
+            if f"{name}_unique" in existing or _create_constraint(session, name, label, prop):
+                unique += 1
+    _schema_state['constraints'] = unique == len(SCHEMA_CONSTRAINTS)
+    print(f"Schema constraints ensured ({unique}/{len(SCHEMA_CONSTRAINTS)})")
+    return _schema_state['constraints']
+
+
+# Bump when migrate_old_schema gains a step; databases at this version skip it
+SCHEMA_VERSION = 3
+
+
+def _migrate_schema(tx):
+    """migrate_old_schema steps; None if already current, else User nodes migrated"""
+    # Migration already applied to this database: no full-graph scans
+    marker = tx.run("""
+        MERGE (v:SchemaVersion)
+        ON CREATE SET v.version = 0
+        RETURN v.version as version
+    """).single()
+    if marker and marker['version'] >= SCHEMA_VERSION:
+        return None
+    
+    # Add Person label to all User nodes (queries elsewhere match :Person only)
+    migrated = tx.run("""
+        MATCH (u:User)
+        WHERE NOT u:Person
+        SET u:Person
+        SET u.is_creator = CASE WHEN u.username = 'admin' THEN true ELSE false END
+    """).consume().counters.labels_added
+    
+    # Drop the legacy label so every node is reached through the
+    # Person constraints alone; HAS_SESSION edges stay attached
+    tx.run("""
+        MATCH (u:User)
+        REMOVE u:User
+    """).consume()
+    
+    # The Agent is seeked once up front and carried into each scan,
+    # rather than joined against every Person/Session as a cartesian product
+    # Create USES relationships for all users to Agent
+    tx.run("""
+        MATCH (a:Agent {name: 'Pentagon'})
+        WITH a
+        MATCH (p:Person)
+        WHERE NOT EXISTS { (p)-[:USES]->(a) }
+        CREATE (p)-[:USES]->(a)
+    """).consume()
+    
+    # Create CREATED relationship for admin
+    tx.run("""
+        MATCH (a:Agent {name: 'Pentagon'})
+        WITH a
+        MATCH (p:Person {username: 'admin'})
+        WHERE NOT EXISTS { (p)-[:CREATED]->(a) }
+        CREATE (p)-[:CREATED]->(a)
+    """).consume()
+    
+    # Migrate old sessions to have WITH_AGENT relationship
+    tx.run("""
+        MATCH (a:Agent {name: 'Pentagon'})
+        WITH a
+        MATCH (s:Session)
+        WHERE NOT EXISTS { (s)-[:WITH_AGENT]->(a) }
+        CREATE (s)-[:WITH_AGENT]->(a)
+    """).consume()
+    
+    # Migrate old sessions: convert inputN/outputN to arrays if needed
+    tx.run("""
+        MATCH (s:Session)
+        WHERE s.messages IS NULL
+        SET s.messages = [], s.sentiments = [], s.entities = [], s.timestamps = []
+    """).consume()
+    
+    # Clean up old base Person node if exists
+    tx.run("""
+        MATCH (p:Person {type: 'base'})
+        WHERE NOT (p)<-[:IS_A]-()
+        DELETE p
+    """).consume()
+    
+    tx.run("""
+        MATCH (v:SchemaVersion)
+        SET v.version = $version
+    """, version=SCHEMA_VERSION).consume()
+    return migrated
+
+
 def migrate_old_schema():
-    """Migrate old User nodes to Person nodes if they exist"""
+    """Migrate old User nodes to Person nodes if they exist (once per database)"""
     d = get_driver()
     if not d:
         return False
     
     try:
-        with d.session() as session:
-            # Check if old User nodes exist
-            old_users = session.run("""
-                MATCH (u:User)
-                WHERE NOT u:Person
-                RETURN count(u) as count
-            """).single()
-            
-            if old_users and old_users['count'] > 0:
-                print(f"Migrating {old_users['count']} old User nodes to Person nodes...")
-                
-                # Add Person label to all User nodes
-                session.run("""
-                    MATCH (u:User)
-                    SET u:Person
-                    SET u.is_creator = CASE WHEN u.username = 'admin' THEN true ELSE false END
-                """)
-                
-                # Migrate old HAS_SESSION relationships (User->Session to Person->Session)
-                # They already work since Person now has User label too
-                
-                # Create USES relationships for all users to Agent
-                session.run("""
-                    MATCH (p:Person), (a:Agent {name: 'Pentagon'})
-                    WHERE NOT (p)-[:USES]->(a)
-                    CREATE (p)-[:USES]->(a)
-                """)
-                
-                # Create CREATED relationship for admin
-                session.run("""
-                    MATCH (p:Person {username: 'admin'}), (a:Agent {name: 'Pentagon'})
-                    WHERE NOT (p)-[:CREATED]->(a)
-                    CREATE (p)-[:CREATED]->(a)
-                """)
-                
-                # Migrate old sessions to have WITH_AGENT relationship
-                session.run("""
-                    MATCH (s:Session), (a:Agent {name: 'Pentagon'})
-                    WHERE NOT (s)-[:WITH_AGENT]->(a)
-                    CREATE (s)-[:WITH_AGENT]->(a)
-                """)
-                
-                # Migrate old sessions: convert inputN/outputN to arrays if needed
-                session.run("""
-                    MATCH (s:Session)
-                    WHERE s.messages IS NULL
-                    SET s.messages = [], s.sentiments = [], s.entities = [], s.timestamps = []
-                """)
-                
-                print("Migration completed!")
-            
-            # Clean up old base Person node if exists
-            session.run("""
-                MATCH (p:Person {type: 'base'})
-                WHERE NOT (p)<-[:IS_A]-()
-                DELETE p
-            """)
-            
+        # One transaction: a single commit (and WAL flush) for every step,
+        # retried as a whole on transient errors
+        with d.session(database=NEO4J_DATABASE) as session:
+            migrated = session.execute_write(_migrate_schema)
+        if migrated is None:
             return True
+        if migrated:
+            print(f"Migrated {migrated} old User nodes to Person nodes")
+        print(f"Schema migrated to version {SCHEMA_VERSION}")
+        return True
     except Exception as e:
         print(f"Migration error (non-fatal): {e}")
         return False
@@ -145,9 +449,12 @@ def init_graph_structure():
         return False
     
     try:
-        with d.session() as session:
+        # Indexes first so the MERGE/MATCH lookups below can use them
+        ensure_indexes()
+        
+        with d.session(database=NEO4J_DATABASE) as session:
             # Create Agent node (Pentagon bot) first
-            session.run("""
+            session.execute_write(lambda tx: tx.run("""
                 MERGE (a:Agent {name: 'Pentagon'})
                 ON CREATE SET 
                     a.creator = 'Pentagon Team',
@@ -155,77 +462,77 @@ def init_graph_structure():
                     a.city = 'Lahore',
                     a.company = 'Microsoft',
                     a.created_at = datetime()
-            """)
+            """).consume())
             print("Agent node initialized (Pentagon)")
             
             # Run migration for old schema
             migrate_old_schema()
             
-            # Check if admin exists (as Person or User)
-            admin_exists = session.run("""
-                MATCH (p)
-                WHERE (p:Person OR p:User) AND p.username = 'admin'
-                RETURN p
-            """).single()
-            
-            if not admin_exists:
-                admin_id = str(uuid.uuid4())
-                session.run("""
-                    MATCH (a:Agent {name: 'Pentagon'})
-                    CREATE (p:Person {
-                        id: $id,
-                        username: 'admin',
-                        name: 'Administrator',
-                        email: 'admin@pentagon.ai',
-                        password_hash: $password_hash,
-                        is_creator: true,
-                        created_at: datetime()
-                    })
-                    CREATE (p)-[:CREATED]->(a)
-                    CREATE (p)-[:USES]->(a)
-                """, id=admin_id, password_hash=hash_password('12345678'))
+            # Constraint-backed MERGE: no separate existence probe, and
+            # concurrent cold starts still end up with a single admin
+            created = session.execute_write(lambda tx: tx.run("""
+                MATCH (a:Agent {name: 'Pentagon'})
+                MERGE (p:Person {username: 'admin'})
+                ON CREATE SET
+                    p.id = $id,
+                    p.name = 'Administrator',
+                    p.email = 'admin@pentagon.ai',
+                    p.password_hash = $password_hash,
+                    p.is_creator = true,
+                    p.created_at = datetime()
+                MERGE (p)-[:CREATED]->(a)
+                MERGE (p)-[:USES]->(a)
+            """, id=str(uuid.uuid4()), password_hash=hash_password('12345678')).consume().counters.nodes_created)
+            if created:
                 print("Admin Person created (username: admin, password: 12345678)")
             
             print("Graph structure initialized successfully!")
             return True
-    except Exception as e:
-        print(f"Error initializing graph structure: {e}")
+    except Exception:
+        logger.exception("Error initializing graph structure")
         return False
 
 
 # ============== PERSON MANAGEMENT ==============
 
+# Property key named in a uniqueness ConstraintError, e.g.
+# "Node(7) already exists with label `Person` and property `email` = '...'"
+_CONSTRAINT_PROPERTY = re.compile(r"already exists with label `[^`]*` and propert(?:y|ies) `([^`]+)`")
+
+
+def _violated_property(error):
+    """Property key whose uniqueness constraint `error` reports, or None"""
+    match = _CONSTRAINT_PROPERTY.search(error.message or '')
+    return match.group(1) if match else None
+
+
 def create_user(username, name, email, password):
     """Create a new Person node with USES relationship to Agent"""
     d = get_driver()
     if not d:
         return False, "Database connection error", None
     
+    # Computed before the transaction so a retried write does not redo them
+    person_id = str(uuid.uuid4())
+    password_hash = hash_password(password)
+    
     try:
-        with d.session() as session:
-            # Check if username exists (support both Person and User labels)
-            existing = session.run("""
-                MATCH (p)
-                WHERE (p:Person OR p:User) AND p.username = $username
-                RETURN p
-            """, username=username).single()
-            
-            if existing:
-                return False, "Username already exists", None
-            
-            # Check if email exists (support both Person and User labels)
-            email_exists = session.run("""
-                MATCH (p)
-                WHERE (p:Person OR p:User) AND p.email = $email
-                RETURN p
-            """, email=email).single()
+        with _session(d) as session:
+            # Without the full set of uniqueness constraints (see
+            # ensure_indexes) the database would accept duplicates: check first
+            if not _schema_state['constraints']:
+                taken = _read_single(session, """
+                    RETURN EXISTS { (:Person {username: $username}) } as username_taken,
+                           EXISTS { (:Person {email: $email}) } as email_taken
+                """, username=username, email=email)
+                if taken['username_taken']:
+                    return False, "Username already exists", None
+                if taken['email_taken']:
+                    return False, "Email already registered", None
             
-            if email_exists:
-                return False, "Email already registered", None
-            
-            # Create Person with USES relationship to Agent
-            person_id = str(uuid.uuid4())
-            session.run("""
+            # Create Person with USES relationship to Agent; with the
+            # constraints in place duplicates are rejected by the database
+            session.execute_write(lambda tx: tx.run("""
                 MATCH (a:Agent {name: 'Pentagon'})
                 CREATE (p:Person {
                     id: $id,
@@ -238,7 +545,7 @@ def create_user(username, name, email, password):
                 })
                 CREATE (p)-[:USES]->(a)
             """, id=person_id, username=username, name=name, email=email, 
-                password_hash=hash_password(password))
+                password_hash=password_hash).consume())
             
             return True, "User created successfully", {
                 'id': person_id,
@@ -246,6 +553,10 @@ def create_user(username, name, email, password):
                 'name': name,
                 'email': email
             }
+    except ConstraintError as e:
+        if _violated_property(e) == 'email':
+            return False, "Email already registered", None
+        return False, "Username already exists", None
     except Exception as e:
         return False, f"Error creating user: {e}", None
 
@@ -257,47 +568,32 @@ def authenticate_user(username, password):
         return False, "Database connection error", None
     
     try:
-        with d.session() as session:
-            # Debug: print what we're searching for
-            print(f"[AUTH DEBUG] Attempting login for username: '{username}'")
+        with _session(d, READ_ACCESS) as session:
+            logger.debug("Attempting login for username: %r", username)
             password_hash = hash_password(password)
-            print(f"[AUTH DEBUG] Password hash: {password_hash[:20]}...")
-            
-            # First check if user exists at all
-            user_check = session.run("""
-                MATCH (p)
-                WHERE (p:Person OR p:User) AND p.username = $username
-                RETURN p.username as username, p.password_hash as stored_hash
-            """, username=username).single()
-            
-            if user_check:
-                print(f"[AUTH DEBUG] Found user: {user_check['username']}")
-                print(f"[AUTH DEBUG] Stored hash: {user_check['stored_hash'][:20] if user_check['stored_hash'] else 'None'}...")
-                print(f"[AUTH DEBUG] Hash match: {user_check['stored_hash'] == password_hash}")
-            else:
-                print(f"[AUTH DEBUG] User '{username}' not found in database!")
             
-            # Support both Person and User labels for backward compatibility
-            result = session.run("""
-                MATCH (p)
-                WHERE (p:Person OR p:User) 
-                  AND p.username = $username 
-                  AND p.password_hash = $password_hash
-                RETURN p.id as id, p.username as username, p.name as name, p.email as email
-            """, username=username, password_hash=password_hash).single()
+            # One indexed lookup; the hash comparison happens here, in constant time
+            result = _read_single(session, """
+                MATCH (p:Person {username: $username})
+                RETURN p.id as id, p.username as username, p.name as name, p.email as email,
+                       p.password_hash as password_hash
+            """, username=username)
             
-            if result:
-                print(f"[AUTH DEBUG] Login successful for: {result['username']}")
+            if not result:
+                logger.debug("Login failed - unknown username %r", username)
+            elif hmac.compare_digest(result['password_hash'] or '', password_hash):
+                logger.debug("Login successful for: %s", result['username'])
                 return True, "Login successful", {
                     'id': result['id'],
                     'username': result['username'],
                     'name': result['name'],
                     'email': result['email']
                 }
-            print(f"[AUTH DEBUG] Login failed - password mismatch")
+            else:
+                logger.debug("Login failed - password mismatch for %r", username)
             return False, "Invalid username or password", None
     except Exception as e:
-        print(f"[AUTH DEBUG] Exception: {e}")
+        logger.exception("Authentication error")
         return False, f"Authentication error: {e}", None
 
 
@@ -308,13 +604,12 @@ def save_face_encoding(user_id, face_encoding_str):
         return False, "Database connection error"
     
     try:
-        with d.session() as session:
-            result = session.run("""
-                MATCH (p)
-                WHERE (p:Person OR p:User) AND p.id = $user_id
+        with _session(d) as session:
+            result = session.execute_write(lambda tx: tx.run("""
+                MATCH (p:Person {id: $user_id})
                 SET p.face_encoding = $face_encoding
                 RETURN p.id as id
-            """, user_id=user_id, face_encoding=face_encoding_str).single()
+            """, user_id=user_id, face_encoding=face_encoding_str).single())
             
             if result:
                 return True, "Face encoding saved successfully"
@@ -330,10 +625,10 @@ def get_all_face_encodings():
         return []
     
     try:
-        with d.session() as session:
-            results = session.run("""
-                MATCH (p)
-                WHERE (p:Person OR p:User) AND p.face_encoding IS NOT NULL
+        with _session(d, READ_ACCESS) as session:
+            results = _read(session, """
+                MATCH (p:Person)
+                WHERE p.face_encoding IS NOT NULL
                 RETURN p.id as id, p.username as username, p.name as name, 
                        p.email as email, p.face_encoding as face_encoding
             """)
@@ -348,8 +643,8 @@ def get_all_face_encodings():
                     'face_encoding': record['face_encoding']
                 })
             return users
-    except Exception as e:
-        print(f"Error getting face encodings: {e}")
+    except Exception:
+        logger.exception("Error getting face encodings")
         return []
 
 
@@ -360,21 +655,19 @@ def authenticate_by_face(user_id):
         return False, "Database connection error", None
     
     try:
-        with d.session() as session:
-            result = session.run("""
-                MATCH (p)
-                WHERE (p:Person OR p:User) AND p.id = $user_id
-                RETURN p.id as id, p.username as username, p.name as name, p.email as email
-            """, user_id=user_id).single()
-            
-            if result:
-                return True, "Face login successful", {
-                    'id': result['id'],
-                    'username': result['username'],
-                    'name': result['name'],
-                    'email': result['email']
-                }
-            return False, "User not found", None
+        result = _query_single(d, """
+            MATCH (p:Person {id: $user_id})
+            RETURN p.id as id, p.username as username, p.name as name, p.email as email
+        """, user_id=user_id)
+        
+        if result:
+            return True, "Face login successful", {
+                'id': result['id'],
+                'username': result['username'],
+                'name': result['name'],
+                'email': result['email']
+            }
+        return False, "User not found", None
     except Exception as e:
         return False, f"Authentication error: {e}", None
 
@@ -386,28 +679,27 @@ def get_user_by_id(user_id):
         return None
     
     try:
-        with d.session() as session:
-            result = session.run("""
-                MATCH (p)
-                WHERE (p:Person OR p:User) AND p.id = $user_id
-                RETURN p.id as id, p.username as username, p.name as name, p.email as email
-            """, user_id=user_id).single()
-            
-            if result:
-                return {
-                    'id': result['id'],
-                    'username': result['username'],
-                    'name': result['name'],
-                    'email': result['email']
-                }
-    except Exception as e:
-        print(f"Error getting user: {e}")
+        result = _query_single(d, """
+            MATCH (p:Person {id: $user_id})
+            RETURN p.id as id, p.username as username, p.name as name, p.email as email
+        """, user_id=user_id)
+        
+        if result:
+            return {
+                'id': result['id'],
+                'username': result['username'],
+                'name': result['name'],
+                'email': result['email']
+            }
+    except Exception:
+        logger.exception("Error getting user")
     return None
 
 
 def find_or_create_person(user_id=None, email=None):
     """
-    Find Person/User by user ID or email (supports both labels).
+    Find Person/User by user ID and/or email (supports both labels).
+    When both are given, an ID match is preferred and email is the fallback.
     If not found, returns None (use create_user to create new Person)
     """
     d = get_driver()
@@ -415,21 +707,18 @@ def find_or_create_person(user_id=None, email=None):
         return None
     
     try:
-        with d.session() as session:
-            if user_id:
-                result = session.run("""
-                    MATCH (p)
-                    WHERE (p:Person OR p:User) AND p.id = $user_id
-                    RETURN p.id as id, p.username as username, p.name as name, p.email as email
-                """, user_id=user_id).single()
-            elif email:
-                result = session.run("""
-                    MATCH (p)
-                    WHERE (p:Person OR p:User) AND p.email = $email
-                    RETURN p.id as id, p.username as username, p.name as name, p.email as email
-                """, email=email).single()
-            else:
-                return None
+        if not user_id and not email:
+            return None
+        with _session(d, READ_ACCESS) as session:
+            # One round trip for either key; an id match wins over an email match
+            result = _read_single(session, """
+                MATCH (p:Person)
+                WHERE ($user_id IS NOT NULL AND p.id = $user_id)
+                   OR ($email IS NOT NULL AND p.email = $email)
+                RETURN p.id as id, p.username as username, p.name as name, p.email as email
+                ORDER BY coalesce(p.id = $user_id, false) DESC
+                LIMIT 1
+            """, user_id=user_id or None, email=email or None)
             
             if result:
                 return {
@@ -438,13 +727,16 @@ def find_or_create_person(user_id=None, email=None):
                     'name': result['name'],
                     'email': result['email']
                 }
-    except Exception as e:
-        print(f"Error finding person: {e}")
+    except Exception:
+        logger.exception("Error finding person")
     return None
 
 
 # ============== SESSION MANAGEMENT ==============
 
+# (user_id, session_id) pairs already known to exist, so follow-up turns skip the check
+_verified_sessions = TTLCache(maxsize=50000, ttl=10 * 60)
+
 def get_or_create_session(user_id, session_id=None):
     """
     Get existing session or create new one for user.
@@ -452,28 +744,30 @@ def get_or_create_session(user_id, session_id=None):
       (Person)-[:HAS_SESSION]->(Session)
       (Session)-[:WITH_AGENT]->(Agent)
     """
+    if session_id and _verified_sessions.get((user_id, session_id)):
+        return session_id
+    
     d = get_driver()
     if not d:
         return str(uuid.uuid4())
     
     try:
-        with d.session() as session:
-            # If session_id provided, verify it exists (support both Person and User)
+        with _session(d) as session:
+            # If session_id provided, verify it exists
             if session_id:
-                existing = session.run("""
-                    MATCH (p)-[:HAS_SESSION]->(s:Session {id: $session_id})
-                    WHERE (p:Person OR p:User) AND p.id = $user_id
+                existing = _read_single(session, """
+                    MATCH (p:Person {id: $user_id})-[:HAS_SESSION]->(s:Session {id: $session_id})
                     RETURN s.id as id
-                """, user_id=user_id, session_id=session_id).single()
+                """, user_id=user_id, session_id=session_id)
                 
                 if existing:
+                    _verified_sessions.set((user_id, session_id), True)
                     return session_id
             
             # Create new session with array properties and relationships
             new_session_id = str(uuid.uuid4())
-            session.run("""
-                MATCH (p)
-                WHERE (p:Person OR p:User) AND p.id = $user_id
+            summary = session.execute_write(lambda tx: tx.run("""
+                MATCH (p:Person {id: $user_id})
                 MATCH (a:Agent {name: 'Pentagon'})
                 CREATE (s:Session {
                     id: $session_id,
@@ -481,49 +775,155 @@ def get_or_create_session(user_id, session_id=None):
                     messages: [],
                     sentiments: [],
                     entities: [],
-                    timestamps: []
+                    timestamps: [],
+                    person_names: []
                 })
                 CREATE (p)-[:HAS_SESSION]->(s)
                 CREATE (s)-[:WITH_AGENT]->(a)
-            """, user_id=user_id, session_id=new_session_id)
+            """, user_id=user_id, session_id=new_session_id).consume())
             
+            if summary.counters.nodes_created:
+                _verified_sessions.set((user_id, new_session_id), True)
             return new_session_id
-    except Exception as e:
-        print(f"Error creating session: {e}")
+    except Exception:
+        logger.exception("Error creating session")
         return str(uuid.uuid4())
 
 
-def get_user_sessions(user_id):
-    """Get all sessions for a Person/User (supports both labels)"""
+USER_SESSIONS_QUERY = """
+    MATCH (p:Person {id: $user_id})-[:HAS_SESSION]->(s:Session)
+    RETURN s.id as session_id, toString(s.started_at) as started_at, 
+           CASE WHEN s.messages IS NOT NULL THEN size(s.messages)
+                ELSE coalesce(s.chat_count, 0) END as message_count,
+           s.timestamps[-1] as last_timestamp,
+           s.messages[-2] as last_user_message
+    ORDER BY s.started_at DESC
+"""
+
+# Same rows, one page at a time; ORDER BY ... LIMIT keeps a top-k heap
+RECENT_USER_SESSIONS_QUERY = USER_SESSIONS_QUERY + """
+    SKIP $skip
+    LIMIT $limit
+"""
+
+
+def get_user_sessions(user_id, limit=None, skip=0):
+    """Get all sessions for a Person, newest first.
+    
+    With `limit`, only `limit` sessions (after skipping the `skip` newest
+    ones) are fetched, so callers can page through long-lived users.
+    """
     d = get_driver()
     if not d:
         return []
     
     try:
-        with d.session() as session:
-            results = session.run("""
-                MATCH (p)-[:HAS_SESSION]->(s:Session)
-                WHERE (p:Person OR p:User) AND p.id = $user_id
-                RETURN s.id as session_id, s.started_at as started_at, 
-                       CASE WHEN s.messages IS NOT NULL THEN size(s.messages) ELSE s.chat_count END as message_count
-                ORDER BY s.started_at DESC
-            """, user_id=user_id)
+        with _session(d, READ_ACCESS) as session:
+            if limit is None:
+                results = _read(session, USER_SESSIONS_QUERY, user_id=user_id)
+            else:
+                results = _read(session, RECENT_USER_SESSIONS_QUERY,
+                                user_id=user_id, skip=skip, limit=limit)
             
             sessions = []
             for record in results:
                 sessions.append({
                     'session_id': record['session_id'],
-                    'started_at': str(record['started_at']) if record['started_at'] else None,
-                    'chat_count': record['message_count'] or 0
+                    'started_at': record['started_at'],
+                    'chat_count': record['message_count'],
+                    'last_timestamp': record['last_timestamp'],
+                    'preview': _message_content(record['last_user_message'])
                 })
             return sessions
-    except Exception as e:
-        print(f"Error getting sessions: {e}")
+    except Exception:
+        logger.exception("Error getting sessions")
         return []
 
 
 # ============== CHAT STORAGE (Array-based Session Memory) ==============
 
+# Appends one or more turns to the Session arrays; shared by store_chat and
+# store_chats_batch so both run the same (cached) query plan
+APPEND_CHATS_QUERY = """
+    MATCH (s:Session {id: $session_id})
+    SET s.messages = s.messages + $messages,
+        s.sentiments = s.sentiments + $sentiments,
+        s.entities = s.entities + $entities,
+        s.timestamps = s.timestamps + $timestamps,
+        s.person_names = s.person_names + $person_names,
+        s.last_updated = datetime()
+    RETURN size(s.timestamps) as count
+"""
+
+# APPEND_CHATS_QUERY as display lines, returned with every chat response
+APPEND_CHATS_DISPLAY = (
+    ["// Store chat in session arrays (messages, sentiments, entities, timestamps)"]
+    + textwrap.dedent(APPEND_CHATS_QUERY).strip().splitlines()
+)
+
+
+def _person_name(entity):
+    """Name of a PERSON entity dict ({name, type} or {text, label}), else None"""
+    if not isinstance(entity, dict):
+        return None
+    if entity.get('type') == 'PERSON':
+        return entity.get('name')
+    if entity.get('label') == 'PERSON':
+        return entity.get('text')
+    return None
+
+
+def _chat_arrays(chats):
+    """Flatten chat dicts into the parallel arrays stored on a Session"""
+    messages, sentiments, entities, timestamps, person_names = [], [], [], [], []
+    for chat in chats:
+        nlp_data = chat.get('nlp_data')
+        # Extract sentiment
+        sentiment = 0.0
+        if nlp_data and 'sentiment' in nlp_data and nlp_data['sentiment']:
+            # analyze_sentiment nests the compound score under 'scores'
+            scores = nlp_data['sentiment'].get('scores') or nlp_data['sentiment']
+            sentiment = float(scores.get('compound', 0.0))
+        # Extract entities
+        ents = []
+        if nlp_data and 'entities' in nlp_data:
+            ents = nlp_data['entities']  # List of entity dicts
+        messages.append(orjson.dumps({'role': 'user', 'content': chat['user_input']}).decode())
+        messages.append(orjson.dumps({'role': 'agent', 'content': chat['agent_output']}).decode())
+        sentiments.append(sentiment)
+        entities.append(orjson.dumps(ents).decode() if ents else '[]')
+        timestamps.append(chat['timestamp'])
+        # PERSON names are kept as a plain string array too, so name lookups
+        # never have to parse the entity JSON
+        person_names.extend(name for name in map(_person_name, ents) if name)
+    return {'messages': messages, 'sentiments': sentiments,
+            'entities': entities, 'timestamps': timestamps,
+            'person_names': person_names}
+
+
+def store_chats_batch(session_id, chats):
+    """
+    Append several chats to a Session in one write transaction.
+    Each chat is a dict with user_input, agent_output, timestamp and nlp_data.
+    Returns the session's chat count after the write, or None on failure.
+    """
+    if not chats:
+        return None
+    d = get_driver()
+    if not d:
+        return None
+    
+    params = _chat_arrays(chats)
+    try:
+        with _session(d) as session:
+            result = session.execute_write(lambda tx: tx.run(
+                APPEND_CHATS_QUERY, session_id=session_id, **params).single())
+            return result['count'] if result else None
+    except Exception:
+        logger.exception("Error storing chats")
+        return None
+
+
 def store_chat(user_id, session_id, user_input, agent_output, timestamp, nlp_data, prev_chat_id=None):
     """
     Store chat in Session node by appending to arrays:
@@ -532,209 +932,158 @@ def store_chat(user_id, session_id, user_input, agent_output, timestamp, nlp_dat
       - entities[]: extracted entities
       - timestamps[]: time of each message
     """
-    d = get_driver()
-    if not d:
+    count = store_chats_batch(session_id, [{
+        'user_input': user_input,
+        'agent_output': agent_output,
+        'timestamp': timestamp,
+        'nlp_data': nlp_data
+    }])
+    if count is None:
         return str(uuid.uuid4())
-    
+    # Return a chat ID
+    return f"{session_id}_chat{count}"
+
+
+def _message_content(raw):
+    """Content of a stored {role, content} message JSON string"""
+    if raw is None:
+        return ''
     try:
-        with d.session() as session:
-            # Extract sentiment
-            sentiment = 0.0
-            sentiment_label = "neutral"
-            if nlp_data and 'sentiment' in nlp_data and nlp_data['sentiment']:
-                sentiment = nlp_data['sentiment'].get('compound', 0.0)
-                sentiment_label = nlp_data['sentiment'].get('sentiment', 'neutral')
-            
-            # Extract entities
-            entities = []
-            if nlp_data and 'entities' in nlp_data:
-                entities = nlp_data['entities']  # List of entity dicts
-            
-            # Create message objects
-            user_message = json.dumps({'role': 'user', 'content': user_input})
-            agent_message = json.dumps({'role': 'agent', 'content': agent_output})
-            
-            # Create entity JSON
-            entities_json = json.dumps(entities) if entities else '[]'
-            
-            # Append to Session arrays
-            session.run("""
-                MATCH (s:Session {id: $session_id})
-                SET s.messages = s.messages + [$user_msg, $agent_msg],
-                    s.sentiments = s.sentiments + [$sentiment],
-                    s.entities = s.entities + [$entities],
-                    s.timestamps = s.timestamps + [$timestamp],
-                    s.last_updated = datetime()
-            """, session_id=session_id, 
-                user_msg=user_message, agent_msg=agent_message,
-                sentiment=sentiment, entities=entities_json, timestamp=timestamp)
-            
-            # Return a chat ID
-            result = session.run("""
-                MATCH (s:Session {id: $session_id})
-                RETURN size(s.timestamps) as count
-            """, session_id=session_id).single()
-            
-            count = result['count'] if result else 1
-            return f"{session_id}_chat{count}"
-    except Exception as e:
-        print(f"Error storing chat: {e}")
-        return str(uuid.uuid4())
+        return orjson.loads(raw).get('content', '')
+    except orjson.JSONDecodeError:
+        return raw
+
+
+# One row per chat of a Session `s`, unrolled server-side for both the
+# array format and the old inputN/outputN property format; no session
+# node is ever returned, only the per-chat fields
+CHAT_ROWS_CYPHER = """
+    WITH s, size(coalesce(s.messages, [])) > 0 AS arrays
+    UNWIND CASE WHEN arrays
+                THEN range(1, (size(s.messages) + 1) / 2)
+                ELSE range(1, toInteger(coalesce(s.chat_count, 0))) END AS i
+    WITH s, arrays, i,
+         CASE WHEN arrays THEN s.messages[2 * i - 2] ELSE s['input' + toString(i)] END AS input,
+         CASE WHEN arrays THEN s.messages[2 * i - 1] ELSE s['output' + toString(i)] END AS output
+    WHERE arrays OR (input <> '' AND output <> '')
+"""
 
+CHAT_ROW_FIELDS = """
+    s.id as session_id, arrays, i as chat_number, input, output,
+    CASE WHEN arrays THEN coalesce(s.sentiments[i - 1], 0)
+         ELSE coalesce(s['sentiment' + toString(i)], 'neutral') END as sentiment,
+    CASE WHEN arrays THEN s.timestamps[i - 1]
+         ELSE s['timestamp' + toString(i)] END as timestamp
+"""
 
-def get_chat_history(user_id):
-    """Get all chats for a Person/User across all sessions (supports both labels and old schema)"""
+CHAT_HISTORY_QUERY = (
+    "MATCH (p:Person {id: $user_id})-[:HAS_SESSION]->(s:Session)"
+    + CHAT_ROWS_CYPHER + "RETURN" + CHAT_ROW_FIELDS
+    + "ORDER BY s.started_at ASC, chat_number ASC"
+)
+
+# Newest-first page of CHAT_HISTORY_QUERY; only `limit` rows leave the server
+RECENT_CHAT_HISTORY_QUERY = (
+    "MATCH (p:Person {id: $user_id})-[:HAS_SESSION]->(s:Session)"
+    + CHAT_ROWS_CYPHER + "RETURN" + CHAT_ROW_FIELDS
+    + "ORDER BY s.started_at DESC, chat_number DESC SKIP $skip LIMIT $limit"
+)
+
+SESSION_CHAT_HISTORY_QUERY = (
+    "MATCH (p:Person {id: $user_id})-[:HAS_SESSION]->(s:Session {id: $session_id})"
+    + CHAT_ROWS_CYPHER + "RETURN" + CHAT_ROW_FIELDS
+    + ", CASE WHEN arrays THEN s.entities[i - 1] END as entities"
+    + " ORDER BY chat_number ASC"
+)
+
+# Newest-first page of SESSION_CHAT_HISTORY_QUERY
+RECENT_SESSION_CHAT_HISTORY_QUERY = (
+    "MATCH (p:Person {id: $user_id})-[:HAS_SESSION]->(s:Session {id: $session_id})"
+    + CHAT_ROWS_CYPHER + "RETURN" + CHAT_ROW_FIELDS
+    + ", CASE WHEN arrays THEN s.entities[i - 1] END as entities"
+    + " ORDER BY chat_number DESC SKIP $skip LIMIT $limit"
+)
+
+
+def get_chat_history(user_id, limit=None, skip=0):
+    """Get chats for a Person across all sessions (supports old schema).
+    
+    With `limit`, only the `limit` most recent chats (after skipping the
+    `skip` newest ones) are fetched; they are still returned oldest first.
+    """
     d = get_driver()
     if not d:
         return []
     
     try:
-        with d.session() as session:
-            results = session.run("""
-                MATCH (p)-[:HAS_SESSION]->(s:Session)
-                WHERE (p:Person OR p:User) AND p.id = $user_id
-                RETURN s as session_node, s.id as session_id, s.messages as messages, 
-                       s.sentiments as sentiments, s.entities as entities,
-                       s.timestamps as timestamps, s.started_at as started_at,
-                       s.chat_count as chat_count
-                ORDER BY s.started_at ASC
-            """, user_id=user_id)
+        with _session(d, READ_ACCESS) as session:
+            if limit is None:
+                results = _read(session, CHAT_HISTORY_QUERY, user_id=user_id)
+            else:
+                results = _read(session, RECENT_CHAT_HISTORY_QUERY,
+                                user_id=user_id, skip=skip, limit=limit)
+                results.reverse()
             
             all_chats = []
             for record in results:
-                session_id = record['session_id']
-                messages = record['messages']
-                
-                # Check if using new array format or old inputN/outputN format
-                if messages is not None and len(messages) > 0:
-                    # New format: arrays
-                    sentiments = record['sentiments'] or []
-                    timestamps = record['timestamps'] or []
-                    
-                    chat_num = 0
-                    for i in range(0, len(messages), 2):
-                        chat_num += 1
-                        try:
-                            user_msg = json.loads(messages[i]) if i < len(messages) else {}
-                            agent_msg = json.loads(messages[i+1]) if i+1 < len(messages) else {}
-                        except:
-                            user_msg = {'content': messages[i] if i < len(messages) else ''}
-                            agent_msg = {'content': messages[i+1] if i+1 < len(messages) else ''}
-                        sentiment_idx = chat_num - 1
-                        
-                        all_chats.append({
-                            'session_id': session_id,
-                            'chat_number': chat_num,
-                            'input': user_msg.get('content', ''),
-                            'output': agent_msg.get('content', ''),
-                            'sentiment': sentiments[sentiment_idx] if sentiment_idx < len(sentiments) else 0,
-                            'timestamp': timestamps[sentiment_idx] if sentiment_idx < len(timestamps) else None
-                        })
-                else:
-                    # Old format: inputN/outputN properties
-                    sess = dict(record['session_node'])
-                    chat_count = record['chat_count'] or 0
-                    
-                    for i in range(1, int(chat_count) + 1):
-                        input_val = sess.get(f'input{i}')
-                        output_val = sess.get(f'output{i}')
-                        sentiment_val = sess.get(f'sentiment{i}', 'neutral')
-                        timestamp_val = sess.get(f'timestamp{i}')
-                        
-                        if input_val and output_val:
-                            all_chats.append({
-                                'session_id': session_id,
-                                'chat_number': i,
-                                'input': input_val,
-                                'output': output_val,
-                                'sentiment': sentiment_val,
-                                'timestamp': timestamp_val
-                            })
+                arrays = record['arrays']
+                all_chats.append({
+                    'session_id': record['session_id'],
+                    'chat_number': record['chat_number'],
+                    'input': _message_content(record['input']) if arrays else record['input'],
+                    'output': _message_content(record['output']) if arrays else record['output'],
+                    'sentiment': record['sentiment'],
+                    'timestamp': record['timestamp']
+                })
             
             return all_chats
-    except Exception as e:
-        print(f"Error getting chat history: {e}")
+    except Exception:
+        logger.exception("Error getting chat history")
         return []
 
 
-def get_chat_history_by_session(user_id, session_id):
-    """Get chats for a specific session (supports both labels and old schema)"""
+def get_chat_history_by_session(user_id, session_id, limit=None, skip=0):
+    """Get chats for a specific session (supports old schema).
+    
+    `limit`/`skip` page from the newest chat, as in get_chat_history.
+    """
     d = get_driver()
     if not d:
         return []
     
     try:
-        with d.session() as session:
-            result = session.run("""
-                MATCH (p)-[:HAS_SESSION]->(s:Session {id: $session_id})
-                WHERE (p:Person OR p:User) AND p.id = $user_id
-                RETURN s as session_node, s.messages as messages, s.sentiments as sentiments,
-                       s.entities as entities, s.timestamps as timestamps, s.chat_count as chat_count
-            """, user_id=user_id, session_id=session_id).single()
-            
-            if not result:
-                return []
+        with _session(d, READ_ACCESS) as session:
+            if limit is None:
+                results = _read(session, SESSION_CHAT_HISTORY_QUERY,
+                                user_id=user_id, session_id=session_id)
+            else:
+                results = _read(session, RECENT_SESSION_CHAT_HISTORY_QUERY,
+                                user_id=user_id, session_id=session_id,
+                                skip=skip, limit=limit)
+                results.reverse()
             
-            messages = result['messages']
             chats = []
-            
-            # Check if using new array format or old inputN/outputN format
-            if messages is not None and len(messages) > 0:
-                # New format
-                sentiments = result['sentiments'] or []
-                entities = result['entities'] or []
-                timestamps = result['timestamps'] or []
-                
-                chat_num = 0
-                for i in range(0, len(messages), 2):
-                    chat_num += 1
-                    try:
-                        user_msg = json.loads(messages[i]) if i < len(messages) else {}
-                        agent_msg = json.loads(messages[i+1]) if i+1 < len(messages) else {}
-                    except:
-                        user_msg = {'content': messages[i] if i < len(messages) else ''}
-                        agent_msg = {'content': messages[i+1] if i+1 < len(messages) else ''}
-                    sentiment_idx = chat_num - 1
-                    
+            for record in results:
+                arrays = record['arrays']
+                ent_list = []
+                if arrays and record['entities']:
                     try:
-                        ent_list = json.loads(entities[sentiment_idx]) if sentiment_idx < len(entities) else []
-                    except:
+                        ent_list = orjson.loads(record['entities'])
+                    except orjson.JSONDecodeError:
                         ent_list = []
-                    
-                    chats.append({
-                        'session_id': session_id,
-                        'chat_number': chat_num,
-                        'input': user_msg.get('content', ''),
-                        'output': agent_msg.get('content', ''),
-                        'sentiment': sentiments[sentiment_idx] if sentiment_idx < len(sentiments) else 0,
-                        'entities': ent_list,
-                        'timestamp': timestamps[sentiment_idx] if sentiment_idx < len(timestamps) else None
-                    })
-            else:
-                # Old format: inputN/outputN properties
-                sess = dict(result['session_node'])
-                chat_count = result['chat_count'] or 0
-                
-                for i in range(1, int(chat_count) + 1):
-                    input_val = sess.get(f'input{i}')
-                    output_val = sess.get(f'output{i}')
-                    sentiment_val = sess.get(f'sentiment{i}', 'neutral')
-                    timestamp_val = sess.get(f'timestamp{i}')
-                    
-                    if input_val and output_val:
-                        chats.append({
-                            'session_id': session_id,
-                            'chat_number': i,
-                            'input': input_val,
-                            'output': output_val,
-                            'sentiment': sentiment_val,
-                            'entities': [],
-                            'timestamp': timestamp_val
-                        })
+                chats.append({
+                    'session_id': session_id,
+                    'chat_number': record['chat_number'],
+                    'input': _message_content(record['input']) if arrays else record['input'],
+                    'output': _message_content(record['output']) if arrays else record['output'],
+                    'sentiment': record['sentiment'],
+                    'entities': ent_list,
+                    'timestamp': record['timestamp']
+                })
             
             return chats
-    except Exception as e:
-        print(f"Error getting session chat history: {e}")
+    except Exception:
+        logger.exception("Error getting session chat history")
         return []
 
 
@@ -750,12 +1099,12 @@ def get_session_memory(session_id):
         return None
     
     try:
-        with d.session() as session:
-            result = session.run("""
+        with _session(d, READ_ACCESS) as session:
+            result = _read_single(session, """
                 MATCH (s:Session {id: $session_id})
                 RETURN s.messages as messages, s.sentiments as sentiments,
                        s.entities as entities, s.timestamps as timestamps
-            """, session_id=session_id).single()
+            """, session_id=session_id)
             
             if result:
                 return {
@@ -764,11 +1113,45 @@ def get_session_memory(session_id):
                     'entities': result['entities'] or [],
                     'timestamps': result['timestamps'] or []
                 }
-    except Exception as e:
-        print(f"Error getting session memory: {e}")
+    except Exception:
+        logger.exception("Error getting session memory")
     return None
 
 
+# Mean of sentiments[] (0.0 when empty), evaluated server-side
+AVERAGE_SENTIMENT_EXPR = (
+    "CASE WHEN size(coalesce(s.sentiments, [])) > 0 "
+    "THEN reduce(total = 0.0, x IN s.sentiments | total + x) / size(s.sentiments) "
+    "ELSE 0.0 END"
+)
+
+# Per query type, the part of the Session memory the answer depends on.
+# Element access and filtering happen in Cypher so only that part crosses Bolt.
+SESSION_MEMORY_PROJECTIONS = {
+    # Old sessions have no person_names; ship only entity rows that can hold
+    # a PERSON (both stored shapes contain the quoted label)
+    'user_name': "{name: s.person_names[-1], "
+                 "entities: CASE WHEN s.person_names IS NULL "
+                 "THEN [e IN coalesce(s.entities, []) WHERE e CONTAINS '\"PERSON\"'] END}",
+    'last_message': 's.messages[-1]',
+    'first_message': 's.messages[0]',
+    'last_user_message': 's.messages',
+    'last_sentiment': 's.sentiments[-1]',
+    'last_entity': "[e IN coalesce(s.entities, []) WHERE e <> '[]'][-1]",
+    'average_sentiment': AVERAGE_SENTIMENT_EXPR,
+    # Inner text of each non-empty entity array, so Python can join them into
+    # a single JSON array and parse once
+    'all_entities': "[e IN coalesce(s.entities, []) WHERE e <> '[]' | substring(e, 1, size(e) - 2)]",
+    'mood_summary': (f"CASE WHEN {AVERAGE_SENTIMENT_EXPR} > 0.3 THEN 'positive' "
+                     f"WHEN {AVERAGE_SENTIMENT_EXPR} < -0.3 THEN 'negative' ELSE 'neutral' END"),
+}
+
+SESSION_MEMORY_QUERIES = {
+    query_type: f"MATCH (s:Session {{id: $session_id}}) RETURN {projection} as value"
+    for query_type, projection in SESSION_MEMORY_PROJECTIONS.items()
+}
+
+
 def query_session_memory(session_id, query_type):
     """
     Query session memory for specific information.
@@ -782,108 +1165,106 @@ def query_session_memory(session_id, query_type):
       - 'average_sentiment': Average of sentiments[]
       - 'all_entities': All entities mentioned
     """
-    memory = get_session_memory(session_id)
-    if not memory:
+    query = SESSION_MEMORY_QUERIES.get(query_type)
+    d = get_driver()
+    if not query or not d:
         return None
     
-    messages = memory['messages']
-    sentiments = memory['sentiments']
-    entities = memory['entities']
-    
     try:
-        if query_type == 'user_name':
-            # Search for PERSON entity in entities
-            for entity_json in reversed(entities):
-                entity_list = json.loads(entity_json) if isinstance(entity_json, str) else entity_json
-                for ent in entity_list:
-                    if isinstance(ent, dict) and ent.get('label') == 'PERSON':
-                        return ent.get('text')
+        with _session(d, READ_ACCESS) as session:
+            result = _read_single(session, query, session_id=session_id)
+        if not result:
             return None
+        value = result['value']
         
-        elif query_type == 'last_message':
-            if messages:
-                last_msg = json.loads(messages[-1]) if isinstance(messages[-1], str) else messages[-1]
-                return last_msg.get('content')
+        if query_type == 'user_name':
+            if value['name']:
+                return value['name']
+            # Sessions created before person_names existed (it stays null
+            # on them, since null + list is null): search entities
+            for entity_json in reversed(value['entities'] or []):
+                entity_list = orjson.loads(entity_json) if isinstance(entity_json, str) else entity_json
+                for ent in entity_list:
+                    name = _person_name(ent)
+                    if name:
+                        return name
             return None
         
-        elif query_type == 'first_message':
-            if messages:
-                first_msg = json.loads(messages[0]) if isinstance(messages[0], str) else messages[0]
-                return first_msg.get('content')
+        elif query_type in ('last_message', 'first_message'):
+            if value:
+                msg = orjson.loads(value) if isinstance(value, str) else value
+                return msg.get('content')
             return None
         
         elif query_type == 'last_user_message':
             # Find last user message
-            for msg_json in reversed(messages):
-                msg = json.loads(msg_json) if isinstance(msg_json, str) else msg_json
+            for msg_json in reversed(value or []):
+                msg = orjson.loads(msg_json) if isinstance(msg_json, str) else msg_json
                 if msg.get('role') == 'user':
                     return msg.get('content')
             return None
         
         elif query_type == 'last_sentiment':
-            if sentiments:
-                return sentiments[-1]
-            return None
+            return value
         
         elif query_type == 'last_entity':
-            for entity_json in reversed(entities):
-                entity_list = json.loads(entity_json) if isinstance(entity_json, str) else entity_json
+            if value:
+                entity_list = orjson.loads(value) if isinstance(value, str) else value
                 if entity_list:
                     return entity_list[-1]
             return None
         
-        elif query_type == 'average_sentiment':
-            if sentiments:
-                return sum(sentiments) / len(sentiments)
-            return 0.0
+        elif query_type in ('average_sentiment', 'mood_summary'):
+            return value
         
         elif query_type == 'all_entities':
-            all_ents = []
-            for entity_json in entities:
-                entity_list = json.loads(entity_json) if isinstance(entity_json, str) else entity_json
-                all_ents.extend(entity_list)
-            return all_ents
-        
-        elif query_type == 'mood_summary':
-            if sentiments:
-                avg = sum(sentiments) / len(sentiments)
-                if avg > 0.3:
-                    return 'positive'
-                elif avg < -0.3:
-                    return 'negative'
-                else:
-                    return 'neutral'
-            return 'neutral'
+            if not value:
+                return []
+            try:
+                return orjson.loads('[' + ','.join(value) + ']')
+            except orjson.JSONDecodeError:
+                # A malformed row spoils the joined parse; fall back to
+                # per-row parsing and skip only the bad rows
+                all_ents = []
+                for inner in value:
+                    try:
+                        all_ents.extend(orjson.loads('[' + inner + ']'))
+                    except orjson.JSONDecodeError:
+                        continue
+                return all_ents
         
-    except Exception as e:
-        print(f"Error querying session memory: {e}")
+    except Exception:
+        logger.exception("Error querying session memory")
     
     return None
 
 
+# A session's owner never changes, so owners can be kept for a long time
+_session_owner_cache = TTLCache(maxsize=10000, ttl=60 * 60)
+
+
 def get_person_from_session(session_id):
     """Get the Person/User who owns this session (supports both labels)"""
+    person = _session_owner_cache.get(session_id)
+    if person is not None:
+        return asdict(person)
+    
     d = get_driver()
     if not d:
         return None
     
     try:
-        with d.session() as session:
-            result = session.run("""
-                MATCH (p)-[:HAS_SESSION]->(s:Session {id: $session_id})
-                WHERE p:Person OR p:User
-                RETURN p.id as id, p.username as username, p.name as name, p.email as email
-            """, session_id=session_id).single()
-            
-            if result:
-                return {
-                    'id': result['id'],
-                    'username': result['username'],
-                    'name': result['name'],
-                    'email': result['email']
-                }
-    except Exception as e:
-        print(f"Error getting person from session: {e}")
+        result = _query_single(d, """
+            MATCH (p:Person)-[:HAS_SESSION]->(s:Session {id: $session_id})
+            RETURN p.id as id, p.username as username, p.name as name, p.email as email
+        """, session_id=session_id)
+        
+        if result:
+            person = Person(result['id'], result['username'], result['name'], result['email'])
+            _session_owner_cache.set(session_id, person)
+            return asdict(person)
+    except Exception:
+        logger.exception("Error getting person from session")
     return None
 
 
@@ -891,9 +1272,8 @@ def get_person_from_session(session_id):
 
 def get_user_context(user_id, limit=5):
     """Get recent conversation context for a Person"""
-    history = get_chat_history(user_id)
-    # Return last N chats as context
-    return history[-limit:] if history else []
+    # Only the last N chats are fetched from the database
+    return get_chat_history(user_id, limit=limit)
 
 
 def search_knowledge(query, intent, entities):
@@ -905,131 +1285,151 @@ def search_knowledge(query, intent, entities):
 def generate_cypher_queries(user_id, session_id, user_input, agent_output, timestamp, nlp_data, prev_chat_id=None):
     """Generate Cypher queries for visualization/logging purposes"""
     chat_id = f"{session_id}_chat_preview"
-    
-    queries = [
-        f"// Store chat in session arrays (messages, sentiments, entities, timestamps)",
-        f"MATCH (s:Session {{id: '{session_id}'}})",
-        f"SET s.messages = s.messages + [user_msg, agent_msg],",
-        f"    s.sentiments = s.sentiments + [sentiment],",
-        f"    s.entities = s.entities + [entities],",
-        f"    s.timestamps = s.timestamps + [timestamp]"
-    ]
-    
-    return queries, chat_id
+    # The statement store_chat actually runs; values travel as parameters,
+    # so nothing user-supplied is ever spliced into the text
+    return APPEND_CHATS_DISPLAY, chat_id
+
+
+def store_chat_and_emit_cypher(user_id, session_id, user_input, agent_output, timestamp, nlp_data, prev_chat_id=None):
+    """
+    Store a chat turn and return (cypher_queries, chat_id).
+    Replaces calling generate_cypher_queries() and store_chat() back to back.
+    """
+    cypher_queries, _ = generate_cypher_queries(
+        user_id, session_id, user_input, agent_output, timestamp, nlp_data, prev_chat_id
+    )
+    chat_id = store_chat(
+        user_id, session_id, user_input, agent_output, timestamp, nlp_data, prev_chat_id
+    )
+    return cypher_queries, chat_id
 
 
 # ============== GRAPH STATS & INFO ==============
 
+# Short-lived caches for rarely changing reads
+_graph_stats_cache = TTLCache(maxsize=1, ttl=10)
+_agent_info_cache = TTLCache(maxsize=1, ttl=60 * 60)
+
+
+def clear_read_caches():
+    """Drop cached graph stats, agent info and session owners"""
+    _graph_stats_cache.clear()
+    _agent_info_cache.clear()
+    _session_owner_cache.clear()
+
+
 def get_graph_stats():
-    """Get statistics about the graph database"""
+    """Get statistics about the graph database (cached for a few seconds)"""
+    stats = _graph_stats_cache.get('stats')
+    if stats is not None:
+        return stats
+    
     d = get_driver()
     if not d:
         return {'error': 'Not connected'}
     
     try:
-        with d.session() as session:
-            # Count nodes
-            person_count = session.run("MATCH (p:Person) RETURN count(p) as count").single()['count']
-            session_count = session.run("MATCH (s:Session) RETURN count(s) as count").single()['count']
-            agent_count = session.run("MATCH (a:Agent) RETURN count(a) as count").single()['count']
-            
-            # Count total messages
-            msg_result = session.run("""
-                MATCH (s:Session)
-                RETURN sum(size(s.messages)) as total
-            """).single()
-            total_messages = msg_result['total'] if msg_result['total'] else 0
-            
-            # Count relationships
-            rel_result = session.run("""
-                MATCH ()-[r]->()
-                RETURN count(r) as count
-            """).single()
-            relationship_count = rel_result['count'] if rel_result else 0
-            
-            return {
-                'persons': person_count,
-                'sessions': session_count,
-                'agents': agent_count,
-                'total_messages': total_messages,
-                'relationships': relationship_count,
-                'connected': True
-            }
+        # All counts in one round trip
+        result = _query_single(d, """
+            CALL { MATCH (p:Person) RETURN count(p) as persons }
+            CALL { MATCH (s:Session) RETURN count(s) as sessions,
+                                            sum(size(s.messages)) as total_messages }
+            CALL { MATCH (a:Agent) RETURN count(a) as agents }
+            CALL { MATCH ()-[r]->() RETURN count(r) as relationships }
+            RETURN persons, sessions, agents, total_messages, relationships
+        """)
+        
+        stats = {
+            'persons': result['persons'],
+            'sessions': result['sessions'],
+            'agents': result['agents'],
+            'total_messages': result['total_messages'] or 0,
+            'relationships': result['relationships'],
+            'connected': True
+        }
+        _graph_stats_cache.set('stats', stats)
+        return stats
     except Exception as e:
         return {'error': str(e)}
 
 
 def get_agent_info():
-    """Get Agent (Pentagon) information"""
+    """Get Agent (Pentagon) information (cached; the Agent node is only set up at init)"""
+    agent = _agent_info_cache.get('agent')
+    if agent is not None:
+        return agent.as_dict()
+    
     d = get_driver()
     if not d:
         return None
     
     try:
-        with d.session() as session:
-            result = session.run("""
-                MATCH (a:Agent {name: 'Pentagon'})
-                RETURN a.name as name, a.creator as creator, a.members as members,
-                       a.city as city, a.company as company
-            """).single()
-            
-            if result:
-                return {
-                    'name': result['name'],
-                    'creator': result['creator'],
-                    'members': result['members'],
-                    'city': result['city'],
-                    'company': result['company']
-                }
-    except Exception as e:
-        print(f"Error getting agent info: {e}")
+        result = _query_single(d, """
+            MATCH (a:Agent {name: 'Pentagon'})
+            RETURN a.name as name, a.creator as creator, a.members as members,
+                   a.city as city, a.company as company
+        """)
+        
+        if result:
+            agent = AgentInfo(result['name'], result['creator'], tuple(result['members'] or ()),
+                              result['city'], result['company'])
+            _agent_info_cache.set('agent', agent)
+            return agent.as_dict()
+    except Exception:
+        logger.exception("Error getting agent info")
     return None
 
 
-def get_graph_schema():
-    """Return the graph schema description (3 Core Nodes)"""
-    return {
-        'nodes': [
-            {
-                'label': 'Person',
-                'description': 'The human user (long-term identity)',
-                'properties': ['id', 'username', 'name', 'email', 'password_hash', 'is_creator', 'created_at']
-            },
-            {
-                'label': 'Agent',
-                'description': 'The bot (Pentagon)',
-                'properties': ['name', 'creator', 'members', 'city', 'company', 'created_at']
-            },
-            {
-                'label': 'Session',
-                'description': 'One chat conversation instance (Episode - memory container)',
-                'properties': ['id', 'started_at', 'last_updated', 'messages[]', 'sentiments[]', 'entities[]', 'timestamps[]']
-            }
-        ],
-        'relationships': [
-            {'type': 'CREATED', 'from': 'Person', 'to': 'Agent', 'description': 'User is the bot creator'},
-            {'type': 'USES', 'from': 'Person', 'to': 'Agent', 'description': 'User is interacting with bot'},
-            {'type': 'HAS_SESSION', 'from': 'Person', 'to': 'Session', 'description': 'This chat belongs to this user'},
-            {'type': 'WITH_AGENT', 'from': 'Session', 'to': 'Agent', 'description': 'This chat session is with this bot'}
-        ],
-        'session_memory': {
-            'messages': 'All conversation messages [{role, content}]',
-            'sentiments': 'Sentiment score per message',
-            'entities': 'Extracted entities (name, place, topic, etc)',
-            'timestamps': 'Time of each message'
+# Static schema description; built once and shared, so callers must not mutate it
+GRAPH_SCHEMA = {
+    'nodes': [
+        {
+            'label': 'Person',
+            'description': 'The human user (long-term identity)',
+            'properties': ['id', 'username', 'name', 'email', 'password_hash', 'is_creator', 'created_at']
+        },
+        {
+            'label': 'Agent',
+            'description': 'The bot (Pentagon)',
+            'properties': ['name', 'creator', 'members', 'city', 'company', 'created_at']
         },
-        'memory_queries': {
-            'user_name': 'Find PERSON entity inside entities[]',
-            'last_message': 'Last item in messages[]',
-            'last_sentiment': 'Last item in sentiments[]',
-            'last_entity': 'Last item in entities[]',
-            'first_message': 'First item in messages[]',
-            'average_sentiment': 'Average of sentiments[]',
-            'mood_summary': 'Overall mood based on average sentiment'
+        {
+            'label': 'Session',
+            'description': 'One chat conversation instance (Episode - memory container)',
+            'properties': ['id', 'started_at', 'last_updated', 'messages[]', 'sentiments[]', 'entities[]', 'timestamps[]', 'person_names[]']
         }
+    ],
+    'relationships': [
+        {'type': 'CREATED', 'from': 'Person', 'to': 'Agent', 'description': 'User is the bot creator'},
+        {'type': 'USES', 'from': 'Person', 'to': 'Agent', 'description': 'User is interacting with bot'},
+        {'type': 'HAS_SESSION', 'from': 'Person', 'to': 'Session', 'description': 'This chat belongs to this user'},
+        {'type': 'WITH_AGENT', 'from': 'Session', 'to': 'Agent', 'description': 'This chat session is with this bot'}
+    ],
+    'session_memory': {
+        'messages': 'All conversation messages [{role, content}]',
+        'sentiments': 'Sentiment score per message',
+        'entities': 'Extracted entities (name, place, topic, etc)',
+        'timestamps': 'Time of each message',
+        'person_names': 'Names of PERSON entities, in mention order'
+    },
+    'memory_queries': {
+        'user_name': 'Last item in person_names[] (PERSON entities)',
+        'last_message': 'Last item in messages[]',
+        'last_sentiment': 'Last item in sentiments[]',
+        'last_entity': 'Last item in entities[]',
+        'first_message': 'First item in messages[]',
+        'average_sentiment': 'Average of sentiments[]',
+        'mood_summary': 'Overall mood based on average sentiment'
     }
+}
+
+
+def get_graph_schema():
+    """Return the graph schema description (3 Core Nodes)"""
+    return GRAPH_SCHEMA
 
 
-# Initialize on module load
-get_driver()
-init_graph_structure()
+# Graph setup runs on first use (see ensure_initialized); set
+# NEO4J_EAGER_INIT=1 to connect and initialise at import time instead
+if os.environ.get("NEO4J_EAGER_INIT") == "1":
+    get_driver()
@@ -3,34 +3,75 @@ NLTK Processing Module for PEMABOT
 Handles all NLP operations: tokenization, POS tagging, NER, sentiment analysis
 """
 
+import logging
+import re
+from functools import lru_cache
+
 import nltk
 from nltk.tokenize import word_tokenize
-from nltk.tag import pos_tag
-from nltk.chunk import ne_chunk
+from nltk.tag import PerceptronTagger
 from nltk.corpus import wordnet
 from nltk.sentiment import SentimentIntensityAnalyzer
 
-# Download required NLTK data
-NLTK_PACKAGES = [
-    'punkt', 'averaged_perceptron_tagger', 'maxent_ne_chunker',
-    'words', 'wordnet', 'vader_lexicon', 'punkt_tab',
-    'averaged_perceptron_tagger_eng', 'maxent_ne_chunker_tab'
-]
+logger = logging.getLogger(__name__)
+
+# Required NLTK data: package name -> resource path checked before downloading
+NLTK_PACKAGES = {
+    'punkt': 'tokenizers/punkt',
+    'averaged_perceptron_tagger': 'taggers/averaged_perceptron_tagger',
+    'maxent_ne_chunker': 'chunkers/maxent_ne_chunker',
+    'words': 'corpora/words',
+    'wordnet': 'corpora/wordnet',
+    'vader_lexicon': 'sentiment/vader_lexicon.zip',
+    'punkt_tab': 'tokenizers/punkt_tab',
+    'averaged_perceptron_tagger_eng': 'taggers/averaged_perceptron_tagger_eng',
+    'maxent_ne_chunker_tab': 'chunkers/maxent_ne_chunker_tab',
+}
 
 def initialize_nltk():
-    """Download all required NLTK packages"""
-    for package in NLTK_PACKAGES:
+    """Download the required NLTK packages that are not installed yet"""
+    for package, resource in NLTK_PACKAGES.items():
         try:
-            nltk.download(package, quiet=True)
-        except:
+            nltk.data.find(resource)
+            continue  # Already installed: no downloader/network round trip
+        except LookupError:
             pass
+        try:
+            nltk.download(package, quiet=True)
+        except Exception:
+            logger.warning("Could not download NLTK package %s", package, exc_info=True)
     print("NLTK packages initialized")
 
 # Initialize NLTK on module load
 initialize_nltk()
 
-# Initialize sentiment analyzer
-sia = SentimentIntensityAnalyzer()
+
+@lru_cache(maxsize=None)
+def _sia():
+    """Sentiment analyzer, created on first use (loading the VADER lexicon is slow)"""
+    return SentimentIntensityAnalyzer()
+
+@lru_cache(maxsize=None)
+def _tagger():
+    """English perceptron tagger, loaded once (nltk.pos_tag loads a new one per call)"""
+    return PerceptronTagger()
+
+
+@lru_cache(maxsize=None)
+def _ne_chunker():
+    """Multiclass NE chunker, loaded once (nltk.ne_chunk reloads it per call on NLTK 3.9+)"""
+    try:
+        from nltk.chunk import ne_chunker  # NLTK >= 3.9
+    except ImportError:
+        from nltk.chunk import _MULTICLASS_NE_CHUNKER
+        return nltk.data.load(_MULTICLASS_NE_CHUNKER)
+    return ne_chunker()
+
+
+def pos_tag(tokens):
+    """POS-tag a token list (same tags as nltk.pos_tag, with a shared tagger)"""
+    return _tagger().tag(tokens)
+
 
 # Intent patterns for detection
 INTENT_PATTERNS = {
@@ -46,10 +87,23 @@ INTENT_PATTERNS = {
     'information': ['tell me', 'explain', 'describe', 'define', 'meaning of', 'what is']
 }
 
+# One compiled alternation per intent: same "any pattern occurs in the text"
+# test as a substring loop, but each intent is a single C-level search
+INTENT_REGEXES = [
+    (intent, re.compile('|'.join(map(re.escape, patterns))))
+    for intent, patterns in INTENT_PATTERNS.items()
+]
+
+
+@lru_cache(maxsize=4096)
+def _polarity_scores(text):
+    """VADER scores for `text` (cached, since short chat messages repeat); read-only"""
+    return _sia().polarity_scores(text)
+
 
 def analyze_sentiment(text):
     """Analyze sentiment using VADER"""
-    scores = sia.polarity_scores(text)
+    scores = _polarity_scores(text)
     compound = scores['compound']
     if compound >= 0.05:
         sentiment = 'Positive'
@@ -72,19 +126,18 @@ def analyze_sentiment(text):
     }
 
 
-def detect_intent(text):
-    """Detect intent from text using pattern matching and NLP"""
+def detect_intent(text, sentiment=None):
+    """
+    Detect intent from text using pattern matching and NLP.
+    Pass `sentiment` (an analyze_sentiment result for the same text) to
+    reuse it instead of analysing the text again.
+    """
     text_lower = text.lower()
-    detected_intents = []
-    
-    for intent, patterns in INTENT_PATTERNS.items():
-        for pattern in patterns:
-            if pattern in text_lower:
-                detected_intents.append(intent)
-                break
+    detected_intents = [intent for intent, regex in INTENT_REGEXES if regex.search(text_lower)]
     
     # Use sentiment for additional context
-    sentiment = analyze_sentiment(text)
+    if not sentiment:
+        sentiment = analyze_sentiment(text)
     if sentiment['sentiment'] == 'Positive':
         if 'affirmation' not in detected_intents:
             detected_intents.append('positive_sentiment')
@@ -98,33 +151,29 @@ def detect_intent(text):
     return detected_intents
 
 
-def extract_entities(text):
-    """Extract entities from text using NLP"""
+def extract_entities(text, pos_tags_list=None):
+    """
+    Extract entities from text using NLP (named entities plus proper nouns).
+    Pass `pos_tags_list` when the text is already tagged to skip re-tokenizing.
+    """
     entities = []
     try:
-        tokens = word_tokenize(text)
-        pos_tags_list = pos_tag(tokens)
-        tree = ne_chunk(pos_tags_list)
-        
-        for subtree in tree:
-            if hasattr(subtree, 'label'):
-                entity_name = " ".join([word for word, tag in subtree.leaves()])
-                entity_type = subtree.label()
-                entities.append({
-                    'name': entity_name,
-                    'type': entity_type
-                })
+        if pos_tags_list is None:
+            pos_tags_list = pos_tag(word_tokenize(text))
+        entities = extract_named_entities(pos_tags_list)
         
         # Also extract nouns as potential entities
+        seen_names = {e['name'] for e in entities}
         for word, tag in pos_tags_list:
-            if tag in ['NNP', 'NNPS']:  # Proper nouns
-                if not any(e['name'] == word for e in entities):
+            if tag in ('NNP', 'NNPS'):  # Proper nouns
+                if word not in seen_names:
+                    seen_names.add(word)
                     entities.append({
                         'name': word,
                         'type': 'NOUN'
                     })
-    except Exception as e:
-        print(f"Entity extraction error: {e}")
+    except Exception:
+        logger.exception("Entity extraction error")
     
     return entities
 
@@ -143,14 +192,20 @@ def get_wordnet_pos(treebank_tag):
         return None
 
 
+@lru_cache(maxsize=10000)
+def _noun_definition(word):
+    """Definition of the first WordNet noun sense of `word`, or None (cached)"""
+    synsets = wordnet.synsets(word, pos=wordnet.NOUN)
+    return synsets[0].definition() if synsets else None
+
+
 def extract_nouns_with_definitions(pos_tags):
     """Extract nouns and get their WordNet definitions"""
     nouns_with_defs = []
     for word, tag in pos_tags:
         if tag.startswith('NN'):  # NN, NNS, NNP, NNPS
-            synsets = wordnet.synsets(word, pos=wordnet.NOUN)
-            if synsets:
-                definition = synsets[0].definition()
+            definition = _noun_definition(word)
+            if definition:
                 nouns_with_defs.append({
                     'word': word,
                     'definition': definition
@@ -159,10 +214,10 @@ def extract_nouns_with_definitions(pos_tags):
 
 
 def extract_named_entities(pos_tags):
-    """Extract named entities using NLTK's ne_chunk"""
+    """Extract named entities using NLTK's multiclass NE chunker"""
     entities = []
     try:
-        tree = ne_chunk(pos_tags)
+        tree = _ne_chunker().parse(pos_tags)
         for subtree in tree:
             if hasattr(subtree, 'label'):
                 entity_name = " ".join([word for word, tag in subtree.leaves()])
@@ -171,8 +226,8 @@ def extract_named_entities(pos_tags):
                     'name': entity_name,
                     'type': entity_type
                 })
-    except:
-        pass
+    except Exception:
+        logger.exception("Named entity extraction error")
     return entities
 
 
@@ -204,7 +259,18 @@ def process_nlp(text):
         # Sentiment Analysis
         result['sentiment'] = analyze_sentiment(text)
         
-    except Exception as e:
-        print(f"NLP processing error: {e}")
+    except Exception:
+        logger.exception("NLP processing error")
     
     return result
+
+
+def process_nlp_light(text):
+    """Cheap subset of process_nlp (sentiment only) for turns answered without AIML/Neo4j"""
+    return {
+        'tokens': [],
+        'pos_tags': [],
+        'nouns': [],
+        'entities': [],
+        'sentiment': analyze_sentiment(text)
+    }
@@ -0,0 +1,8 @@
+"""
+WSGI entry point for running Pentagon under a production server, e.g.:
+    gunicorn -k gthread -w 1 --threads 8 -b 0.0.0.0:5000 wsgi:application
+"""
+
+from bot import app
+
+application = app